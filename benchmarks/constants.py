@@ -0,0 +1,60 @@
+"""Measure time and memory of transforming a constant-heavy module.
+
+Usage: python benchmarks/constants.py [--size N] [--iters N]
+
+The module is a table of ints, floats and strings. Reports the transform time
+and, in a second traced run, the peak traced memory and the number of live
+allocations when the tree is done.
+"""
+
+import argparse
+import ast
+import random
+import time
+import tracemalloc
+
+import bombast
+
+
+def source(size):
+    rows = []
+    for i in range(size):
+        rows.append(f"    ({i}, {i / 7!r}, {str(i)!r}, {'abc' * (i % 5)!r}),")
+    return "TABLE = [\n" + "\n".join(rows) + "\n]\n"
+
+
+def transform(text, iters):
+    root = ast.parse(text)
+    preprocess = bombast.Preprocess(rng=random.Random(0))
+    preprocess.visit(root)
+    transformer = bombast.Bombast(preprocess)
+    return transformer.transform(root, iters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--iters", type=int, default=2)
+    args = parser.parse_args()
+    text = source(args.size)
+
+    start = time.perf_counter()
+    transform(text, args.iters)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    root = transform(text, args.iters)
+    blocks = sum(
+        stat.count for stat in tracemalloc.take_snapshot().statistics("filename")
+    )
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del root
+
+    print(f"time:   {elapsed:8.3f} s")
+    print(f"peak:   {peak / (1 << 20):8.1f} MB")
+    print(f"blocks: {blocks:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compare the cold-start time of a program with eager and lazy imports.
+
+Usage: python benchmarks/import_time.py PROGRAM [--iters N] [--runs N] [-- ARGS]
+
+The program is obfuscated with and without --lazy-imports, then the original
+and both obfuscated versions are each started ``--runs`` times. The median wall
+clock time of each is reported.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def obfuscate(program, outfile, iters, *options):
+    subprocess.run(
+        [sys.executable, "-c", "from bombast import main; main()"]
+        + [program, outfile, "--iters", str(iters), *options],
+        check=True,
+    )
+
+
+def startup(program, args, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, program, *args],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("program")
+    parser.add_argument("--iters", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("args", nargs="*", help="arguments for the program")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        eager = os.path.join(tmp, "eager.py")
+        lazy = os.path.join(tmp, "lazy.py")
+        obfuscate(args.program, eager, args.iters)
+        obfuscate(args.program, lazy, args.iters, "--lazy-imports")
+        results = {
+            "original": startup(args.program, args.args, args.runs),
+            "eager": startup(eager, args.args, args.runs),
+            "lazy": startup(lazy, args.args, args.runs),
+        }
+    for name, seconds in results.items():
+        print(f"{name:>8}: {seconds * 1000:8.1f} ms")
+    print(f" speedup: {results['eager'] / results['lazy']:8.2f}x (eager / lazy)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Measure how obfuscation throughput scales with threads in one process.
+
+Usage: python benchmarks/threads.py FILE [--threads 1,2,4,8] [--files N] [OPTIONS]
+
+FILE is obfuscated ``--files`` times by a pool of each number of threads, and
+the files per second of each pool are reported. Every output is checked against
+the output of a serial run. Threads only run in parallel on a free-threaded
+build of Python (``python3.13t``); with the GIL, throughput should stay flat.
+Other options are passed to bombast, e.g. ``--iters 2 --constant-pool``.
+"""
+
+import argparse
+import concurrent.futures
+import copy
+import io
+import sys
+import time
+
+import bombast
+from bombast import emit
+
+
+def obfuscate(source, options, config):
+    options = copy.copy(options)
+    options.infile = io.BytesIO(source)
+    options.infile.name = "<benchmark>"
+    root, _, obfuscator = bombast.analyze(options, config)
+    root = bombast.finish(root, obfuscator, options)
+    return emit.unparse(root, None, options.minify)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file")
+    parser.add_argument(
+        "--threads",
+        type=lambda s: [int(n) for n in s.split(",")],
+        default=[1, 2, 4, 8],
+    )
+    parser.add_argument("--files", type=int, default=32)
+    bombast.add_arguments(parser)
+    args = parser.parse_args()
+    config = bombast.configure(args.config)
+    with open(args.file, "rb") as f:
+        source = f.read()
+
+    expected = obfuscate(source, args, config)
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"GIL {'enabled' if gil else 'disabled'}, {args.files} files per run")
+    baseline = None
+    for threads in args.threads:
+        with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+            start = time.perf_counter()
+            outputs = list(
+                executor.map(
+                    obfuscate,
+                    [source] * args.files,
+                    [args] * args.files,
+                    [config] * args.files,
+                )
+            )
+            seconds = time.perf_counter() - start
+        if any(output != expected for output in outputs):
+            sys.exit(f"{threads} threads: output differs from the serial run")
+        rate = args.files / seconds
+        baseline = baseline or rate
+        print(f"{threads:>3} threads: {rate:8.1f} files/s ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,40 +8,136 @@ various transformations to the AST.
 import argparse
 import ast
 import builtins
+import collections
+import copy
 import functools
+import hashlib
+import json
+import keyword
+import os
 import random
 import sys
 
-from bombast import transform, utils
+from bombast import (
+    archive,
+    batch,
+    cluster,
+    emit,
+    introspect,
+    lazy,
+    leaves,
+    materialize,
+    pack,
+    parallel,
+    pgo,
+    pool,
+    search,
+    sourcemap,
+    tape,
+    trace,
+    transform,
+    utils,
+    variants,
+)
 
 
 class Preprocess(ast.NodeVisitor):
     """A NodeVisitor that assigns all identifiers in the AST new names.
 
-    Names in ``Preprocess.ignores`` are untouched. By default, this contains all
-    builtins; define ignore_names in bombast.config to customize further.
+    Names in ``Preprocess.ignores``, which are the builtins, and in ``ignores`` are
+    untouched; define ignore_names in bombast.config to customize further.
+
+    New names are drawn from ``rng``, a ``random.Random``. With ``compact``
+    naming, they are only chosen by ``allocate``, which gives the shortest
+    identifiers to the most frequent names. With a ``seed``, each new name
+    depends only on the seed and the original name, so it does not change when
+    other names are added or removed.
     """
 
-    ignores = set(dir(builtins))
+    ignores = frozenset(dir(builtins))
 
-    def __init__(self):
+    def __init__(self, compact=False, seed=None, rng=None, ignores=()):
         super().__init__()
         self.mapping = {}
         self.imports = set()
+        self.compact = compact
+        self.seed = seed
+        self.rng = random.Random() if rng is None else rng
+        self.ignores = Preprocess.ignores | frozenset(ignores)
+        self.counts = collections.Counter()
+        self.bound = set()  # every name the module binds, see utils.bound_names
 
     def rename(self, name):
+        self.counts[name] += 1
         if name in self.imports:
             return
         if name in self.ignores or name in self.mapping:
             return
-        new_name = utils.randident(4, 10)
+        if self.compact:
+            self.mapping[name] = None
+            return
+        self.mapping[name] = self.draw(name)
+
+    def draw(self, name):
+        """Return a random new name for ``name`` that is not taken yet."""
+        rng = self.rng if self.seed is None else random.Random(f"{self.seed}:{name}")
+        new_name = utils.randident(4, 10, rng)
         while new_name in self.mapping.values():
-            new_name = utils.randident(4, 10)
-        self.mapping[name] = new_name
+            new_name = utils.randident(4, 10, rng)
+        return new_name
+
+    def variant(self, root, seed, shuffle=False):
+        """Return a copy that renames the same identifiers to new names.
+
+        Names are drawn like a run with ``seed`` would draw them, from a new
+        ``rng`` that the variant's transformations can go on using.
+        """
+        variant = copy.copy(self)
+        variant.rng = random.Random(seed)
+        variant.mapping = dict.fromkeys(self.mapping)
+        if self.seed is not None:
+            variant.seed = seed
+        if self.compact:
+            variant.allocate(root, shuffle)
+        else:
+            for name in variant.mapping:
+                variant.mapping[name] = variant.draw(name)
+        return variant
+
+    def allocate(self, root, shuffle=False):
+        """Assign compact names, shortest first, in order of frequency.
+
+        Identifiers that appear anywhere in ``root`` are never allocated. If
+        ``shuffle``, names are permuted among identifiers of the same length.
+        """
+        reserved = set(self.ignores) | self.imports | set(keyword.kwlist)
+        for node in ast.walk(root):
+            for _, value in ast.iter_fields(node):
+                if isinstance(value, str):
+                    reserved.add(value)
+        names = sorted(self.mapping, key=lambda name: -self.counts[name])
+        idents = utils.shortidents(reserved)
+        new_names = [next(idents) for _ in names]
+        if shuffle:
+            lengths = collections.defaultdict(list)
+            for new_name in new_names:
+                lengths[len(new_name)].append(new_name)
+            for group in lengths.values():
+                self.rng.shuffle(group)
+            new_names = [lengths[len(new_name)].pop() for new_name in new_names]
+        self.mapping.update(zip(names, new_names))
+
+    def visit_Module(self, node):
+        self.bound = utils.bound_names(node)
+        self.generic_visit(node)
 
     def visit_Name(self, node):
         self.rename(node.id)
 
+    def visit_Attribute(self, node):
+        self.counts[node.attr] += 1
+        self.generic_visit(node)
+
     def visit_FunctionDef(self, node):
         if not node.name.startswith("__"):
             self.rename(node.name)
@@ -62,34 +158,190 @@ class Preprocess(ast.NodeVisitor):
 
 
 class Bombast(ast.NodeTransformer):
-    """A NodeTransformer that applies ``Transformations`` to the AST."""
+    """A NodeTransformer that applies ``Transformations`` to the AST.
+
+    ``strengths`` maps the line of a function's ``def`` to the number of
+    iterations in which it gets every transformation; afterwards it only gets
+    those with no runtime cost. Nested functions inherit it.
+
+    With the ``constants`` index returned by ``pool.add_helper``, the first
+    iteration replaces pooled constants with calls to the pool.
+
+    With ``elide``, docstrings are removed and annotations are dropped, except
+    in functions and classes with a decorator or base named in
+    ``Bombast.keep_annotations`` or ``keep_annotations``; define
+    keep_annotations in bombast.config to add to it.
+
+    With ``lazy_functions``, "marshal" or "zlib", ``transform`` finally
+    replaces module-level functions with stubs, see ``bombast.materialize``.
+
+    f-strings become calls to ``format``, ``str``, ``repr`` and ``ascii``, unless
+    the program binds any of these names.
+    """
 
-    def __init__(self, preprocess):
+    converters = frozenset({"format", "str", "repr", "ascii"})
+
+    keep_annotations = frozenset(
+        {
+            "BaseModel",
+            "NamedTuple",
+            "Struct",
+            "TypedDict",
+            "attrs",
+            "dataclass",
+            "define",
+            "frozen",
+            "mutable",
+            "register",
+            "s",
+            "singledispatch",
+            "singledispatchmethod",
+            "validate_arguments",
+            "validate_call",
+        }
+    )
+
+    def __init__(
+        self,
+        preprocess,
+        strengths=None,
+        constants=None,
+        elide=False,
+        lazy_functions=None,
+        keep_annotations=(),
+    ):
         super().__init__()
         self.mapping = preprocess.mapping
         self.imports = preprocess.imports
+        self.rng = preprocess.rng  # carries on from the names it drew
+        self.fstrings = Bombast.converters.isdisjoint(preprocess.bound)
+        self.leaves = leaves.Leaves()
+        self.keep_annotations = Bombast.keep_annotations | frozenset(keep_annotations)
+        self.strengths = strengths or {}
+        self.constants = constants
+        self.pooling = False
+        self.elide = elide
+        self.lazy_functions = lazy_functions
+        self.strip = elide  # whether annotations in the current scope are dropped
+        self.iteration = 0
+        self.full = True  # whether the current code gets every transformation
+        self.located = None  # innermost node being visited that has a location
+
+    def variant(self, preprocess):
+        """Return a copy that renames with ``preprocess``, a
+        ``Preprocess.variant``, and draws from its rng."""
+        return Bombast(
+            preprocess,
+            self.strengths,
+            self.constants,
+            self.elide,
+            self.lazy_functions,
+            self.keep_annotations,
+        )
+
+    def path(self):
+        """Return the iteration and source position of the node being
+        transformed, which key its decisions on a ``tape``."""
+        node = self.located
+        if node is None:
+            return (self.iteration,)
+        return (self.iteration, node.lineno, node.col_offset)
 
     def rename(self, name):
+        if self.iteration:  # names are already renamed, and new names may be old ones
+            return name
         return self.mapping.get(name, name)
 
+    def keeps_annotations(self, node):
+        for expr in node.decorator_list + getattr(node, "bases", []):
+            if isinstance(expr, ast.Call):
+                expr = expr.func
+            if isinstance(expr, ast.Attribute) and expr.attr in self.keep_annotations:
+                return True
+            if isinstance(expr, ast.Name) and expr.id in self.keep_annotations:
+                return True
+        return False
+
+    def visit_body(self, body, parent):
+        """Visit the statements of ``body``, which may not end up empty."""
+        new_body = []
+        for stmt in body:
+            stmt = self.visit(stmt)
+            if stmt is not None:
+                new_body.append(stmt)
+        return new_body or [ast.copy_location(ast.Pass(), parent)]
+
+    def transform(self, root, iters):
+        """Apply ``iters`` iterations to ``root``."""
+        for self.iteration in range(iters):
+            with trace.span("iteration", iteration=self.iteration + 1) as info:
+                root = self.visit(root)
+                if info is not None:
+                    info["nodes"] = trace.nodes(root)
+        if self.lazy_functions:
+            helper = self.mapping.get(materialize.HELPER, materialize.HELPER)
+            keep = {self.mapping.get(pool.HELPER, pool.HELPER)}
+            materialize.rewrite(root, helper, self.lazy_functions == "zlib", keep)
+        return root
+
+    def visit(self, node):
+        outer = self.located
+        if getattr(node, "lineno", None) is not None:
+            self.located = node
+        new_node = super().visit(node)
+        if isinstance(new_node, ast.AST) and new_node is not node:
+            if self.located is not None:
+                utils.locate(new_node, self.located)
+        self.located = outer
+        return new_node
+
+    def visit_Module(self, node):
+        body = []
+        for stmt in node.body:
+            self.pooling = (
+                bool(self.constants)
+                and self.iteration == 0
+                and not pool.is_excluded(stmt)
+            )
+            stmt = self.visit(stmt)
+            if stmt is not None:
+                body.append(stmt)
+        self.pooling = False
+        node.body = body
+        return node
+
     def visit_Expr(self, node):
         if isinstance(node.value, ast.Constant) and isinstance(
             node.value.value, str
         ):  # docstring
-            return ast.Expr(ast.Constant(value=utils.randident(20, 30)))
+            if self.elide:
+                return None
+            return ast.Expr(ast.Constant(value=utils.randident(20, 30, self.rng)))
         return ast.Expr(self.visit(node.value))
 
     def visit_Constant(self, node):
-        if isinstance(node.value, bool):
-            return ast.Constant(value=node.value)
-        elif isinstance(node.value, (int, float)):
-            return transform.NumBombast(node).transform()
-        elif isinstance(node.value, str):
-            return transform.StrBombast(node).transform()
-        return ast.Constant(value=node.value)
+        catalog = transform.constants if self.full else transform.folded_constants
+        if self.pooling and self.full:
+            index = self.constants.get(pool.key(node.value))
+            if index is not None:
+                call = ast.Call(
+                    func=self.leaves.name(self.rename(pool.HELPER)),
+                    args=[
+                        transform.numbers.transform(
+                            ast.Constant(value=index), self.rng, self.leaves
+                        )
+                    ],
+                    keywords=[],
+                )
+                call._pooled = True
+                return call
+        bombast = catalog.get(type(node.value))
+        if bombast is None:
+            return node
+        return bombast.transform(node, self.rng, self.leaves)
 
     def visit_Name(self, node):
-        return ast.Name(id=self.rename(node.id), ctx=node.ctx)
+        return self.leaves.name(self.rename(node.id), node.ctx)
 
     def visit_Attribute(self, node):
         if isinstance(node.value, ast.Name) and node.value.id in self.imports:
@@ -102,11 +354,12 @@ class Bombast(ast.NodeTransformer):
         return ast.ExceptHandler(
             type=node.type if node.type is None else self.visit(node.type),
             name=self.rename(node.name),
-            body=[self.visit(b) for b in node.body],
+            body=self.visit_body(node.body, node),
         )
 
     def visit_arg(self, node):
-        return ast.arg(arg=self.rename(node.arg), annotation=node.annotation)
+        annotation = None if self.strip else node.annotation
+        return ast.arg(arg=self.rename(node.arg), annotation=annotation)
 
     def visit_keyword(self, node):
         return ast.keyword(arg=self.rename(node.arg), value=self.visit(node.value))
@@ -118,13 +371,9 @@ class Bombast(ast.NodeTransformer):
         posonlyargs = [self.visit(posonlyarg) for posonlyarg in node.posonlyargs]
         vararg = kwarg = None
         if node.vararg is not None:
-            vararg = ast.arg(
-                arg=self.rename(node.vararg.arg), annotation=node.vararg.annotation
-            )
+            vararg = self.visit(node.vararg)
         if node.kwarg is not None:
-            kwarg = ast.arg(
-                arg=self.rename(node.kwarg.arg), annotation=node.kwarg.annotation
-            )
+            kwarg = self.visit(node.kwarg)
         as_kwargs = dict(
             posonlyargs=posonlyargs,
             args=args,
@@ -137,11 +386,47 @@ class Bombast(ast.NodeTransformer):
         return ast.arguments(**as_kwargs)
 
     def visit_FunctionDef(self, node):
+        outer = self.full, self.strip
+        if node.lineno in self.strengths:
+            self.full = self.iteration < self.strengths[node.lineno]
+        self.strip = self.elide and not self.keeps_annotations(node)
         name = self.rename(node.name)
         args = self.visit(node.args)
-        body = [self.visit(b) for b in node.body]
+        body = self.visit_body(node.body, node)
         decorator_list = [self.visit(d) for d in node.decorator_list]
-        return ast.FunctionDef(name, args, body, decorator_list, node.returns)
+        returns = None if self.strip else node.returns
+        self.full, self.strip = outer
+        return ast.FunctionDef(name, args, body, decorator_list, returns)
+
+    def visit_AsyncFunctionDef(self, node):
+        outer = self.full, self.strip
+        if node.lineno in self.strengths:
+            self.full = self.iteration < self.strengths[node.lineno]
+        self.strip = self.elide and not self.keeps_annotations(node)
+        node = self.generic_visit(node)
+        if self.strip:
+            node.returns = None
+        self.full, self.strip = outer
+        return node
+
+    def visit_AnnAssign(self, node):
+        if not self.strip:
+            return self.generic_visit(node)
+        if node.value is None:
+            return None
+        return ast.Assign(
+            targets=[self.visit(node.target)], value=self.visit(node.value)
+        )
+
+    def generic_visit(self, node):
+        node = super().generic_visit(node)
+        if self.elide:
+            # Statements whose body only held a docstring
+            if not isinstance(node, ast.Module) and getattr(node, "body", None) == []:
+                node.body = [ast.copy_location(ast.Pass(), node)]
+            if isinstance(node, ast.Try) and not node.handlers and not node.finalbody:
+                node.finalbody = [ast.copy_location(ast.Pass(), node)]
+        return node
 
     def visit_Global(self, node):
         return ast.Global([self.rename(n) for n in node.names])
@@ -150,49 +435,68 @@ class Bombast(ast.NodeTransformer):
         return ast.Nonlocal([self.rename(n) for n in node.names])
 
     def visit_ClassDef(self, node):
+        outer = self.strip
+        self.strip = self.elide and not self.keeps_annotations(node)
         name = self.rename(node.name)
         bases = [self.visit(b) for b in node.bases]
-        body = [self.visit(b) for b in node.body]
+        body = self.visit_body(node.body, node)
         decorator_list = [self.visit(d) for d in node.decorator_list]
+        self.strip = outer
         return ast.ClassDef(name, bases, node.keywords, body, decorator_list)
 
+    def visit_Call(self, node):
+        if node.__dict__.get("_pooled", False):
+            return node  # the index was obfuscated when the call was made
+        return self.generic_visit(node)
+
     def visit_FormattedValue(self, node):
+        # f'{x!r:>10}' -> format(repr(x), '>10')
         value = self.visit(node.value)
-        return ast.FormattedValue(
-            value=value,
-            conversion=node.conversion,
-            format_spec=node.format_spec,
-        )
+        if node.conversion != -1:
+            converter = {ord("s"): "str", ord("r"): "repr", ord("a"): "ascii"}
+            func = self.leaves.name(converter[node.conversion])
+            value = ast.Call(func=func, args=[value], keywords=[])
+        args = [value]
+        if node.format_spec is not None:
+            args.append(self.visit(node.format_spec))
+        return ast.Call(func=self.leaves.name("format"), args=args, keywords=[])
 
     def visit_JoinedStr(self, node):
+        # format() calls cost more than the f-string, and may be shadowed
+        if not self.full or not self.fstrings:
+            for value in node.values:
+                if isinstance(value, ast.FormattedValue):
+                    value.value = self.visit(value.value)
+                    if value.format_spec is not None:
+                        value.format_spec = self.visit(value.format_spec)
+            return node
+        if not node.values:
+            return self.visit(ast.Constant(value=""))
         return functools.reduce(
-            lambda x, y: ast.BinOp(left=x, right=y, op=ast.Add()),
+            lambda x, y: ast.BinOp(left=x, right=y, op=leaves.ADD),
             (self.visit(value) for value in node.values),
         )
 
 
+Config = collections.namedtuple("Config", "ignores keep_annotations")
+
+
 def configure(path):
+    """Return the ``Config`` in the configuration file ``path``."""
+    ignores, keep_annotations = set(), set()
     options = utils.load_config(path)
     for option, value in options.items():
         if option == "ignore_names":
-            user_ignores = set(value)
-            Preprocess.ignores |= user_ignores
+            ignores |= set(value)
+        elif option == "keep_annotations":
+            keep_annotations |= set(value)
         else:
             print(f"Warning: {option=} is unused.", file=sys.stderr)
+    return Config(frozenset(ignores), frozenset(keep_annotations))
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Obfuscate Python source code.")
-    parser.add_argument(
-        "infile", type=argparse.FileType("rb"), default=sys.stdin, help="input"
-    )
-    parser.add_argument(
-        "outfile",
-        nargs="?",
-        type=argparse.FileType("w"),
-        default="obfuscated.py",
-        help="output [default: obfuscated.py]",
-    )
+def add_arguments(parser):
+    """Add the obfuscation options shared by every command to ``parser``."""
     parser.add_argument("--seed", type=int, default=0, help="random seed [default: 0]")
     parser.add_argument(
         "--iters", type=int, default=1, help="number of iterations [default: 1]"
@@ -200,34 +504,290 @@ def main():
     parser.add_argument(
         "--config", type=str, help="configuration file [default: bombast.config]"
     )
+    parser.add_argument(
+        "--naming",
+        choices=["random", "compact", "compact-shuffled"],
+        default="random",
+        help="random names, or the shortest names for the most frequent "
+        "identifiers [default: random]",
+    )
     parser.add_argument(
         "--show-translations", action="store_true", help="print translations to stdout"
     )
-    args = parser.parse_args()
-    configure(args.config)
+    parser.add_argument(
+        "--source-map",
+        action="store_true",
+        help="write a source map to <outfile>.map",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="emit one-space indents and no optional whitespace",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="obfuscate top-level statements in parallel with this many "
+        "processes, 0 for all cores [default: serial]",
+    )
+    parser.add_argument(
+        "--introspect-imports",
+        action="store_true",
+        help="do not rename names found in imported installed modules",
+    )
+    parser.add_argument(
+        "--lazy-imports",
+        action="store_true",
+        help="load module-level imports on first use",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="reuse the cached output of unchanged top-level statements",
+    )
+    parser.add_argument(
+        "--cache-dir", type=str, help="cache directory [default: ~/.cache/bombast]"
+    )
+    parser.add_argument(
+        "--constant-pool",
+        action="store_true",
+        help="move constants into one encoded table decoded on first use",
+    )
+    parser.add_argument(
+        "--pack-tables",
+        type=int,
+        metavar="BYTES",
+        help="encode module and class level constant tables of at least BYTES "
+        "marshaled bytes as one compressed payload",
+    )
+    parser.add_argument(
+        "--lazy-functions",
+        choices=["marshal", "zlib"],
+        help="compile module-level functions ahead of time and define them on "
+        "first call, optionally compressed; only runs on this Python version",
+    )
+    parser.add_argument(
+        "--elide",
+        action="store_true",
+        help="remove docstrings and annotations that are not needed at runtime",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="cProfile output or collapsed stacks of the original program; "
+        "hot functions only get rewrites with no runtime cost",
+    )
+    parser.add_argument(
+        "--hot",
+        type=float,
+        default=0.01,
+        help="share of the profiled time from which a function is hot [default: 0.01]",
+    )
+    parser.add_argument(
+        "--profile-report",
+        action="store_true",
+        help="print the strength chosen for each profiled function to stderr",
+    )
+
+
+def units_cache(path, cache_dir=None):
+    """Return the path of the cache of obfuscated statements for ``path``."""
+    key = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()
+    return os.path.join(cache_dir or utils.cache_dir(), "units", key + ".json")
+
+
+def reject(parser, args, options):
+    """Exit with a usage error if ``args`` changes any of ``options`` from its
+    default, for the options of ``add_arguments`` that a command ignores."""
+    for option in options:
+        dest = option[2:].replace("-", "_")
+        if getattr(args, dest) != parser.get_default(dest):
+            parser.error(f"{option} is not supported by this command")
+
 
-    random.seed(args.seed)
-    root = ast.parse(args.infile.read())
-    args.infile.close()
+def analyze(args, config=None, rng=None):
+    """Parse and close ``args.infile``, then choose the renamings.
+
+    Returns the tree, the ``Preprocess`` that found its identifiers and the
+    ``Bombast`` that transforms it. Both share ``rng``, by default a
+    ``random.Random`` seeded with ``args.seed``, left as the transformations of
+    the run expect it. ``config`` defaults to the one in ``args.config``.
+    """
+    if config is None:
+        config = configure(args.config)
+    if rng is None:
+        rng = random.Random(args.seed)
+    with trace.span("parse") as info:
+        source = args.infile.read()
+        args.infile.close()
+        if isinstance(rng, tape.Tape):
+            rng.check(source)
+        root = ast.parse(source)
+        if info is not None:
+            info["nodes"] = trace.nodes(root)
+    strengths = None
+    if args.profile:
+        strengths, report = pgo.strengths(
+            root, args.infile.name, pgo.load(args.profile), args.iters, args.hot
+        )
+        if args.profile_report:
+            print("\n".join(report), file=sys.stderr)
+    ignores = config.ignores
+    if args.introspect_imports:
+        ignores |= introspect.ignores(root, args.cache_dir)
+    if args.lazy_imports:
+        lazy.add_helper(root)
+    if args.pack_tables:
+        pack.rewrite(root, args.pack_tables)
+    constants = pool.add_helper(root, rng) if args.constant_pool else None
+    if args.lazy_functions:
+        materialize.add_helper(root)
 
     # Choose renamings
-    preprocess = Preprocess()
-    preprocess.visit(root)
+    with trace.span("preprocess") as info:
+        preprocess = Preprocess(
+            compact=args.naming != "random",
+            seed=args.seed if args.incremental else None,
+            rng=rng,
+            ignores=ignores,
+        )
+        preprocess.visit(root)
+        if preprocess.compact:
+            preprocess.allocate(root, shuffle=args.naming == "compact-shuffled")
+        if args.lazy_imports:
+            lazy.rewrite(root)
+        if info is not None:
+            info["names"] = len(preprocess.mapping)
+
+    bombast = Bombast(
+        preprocess,
+        strengths,
+        constants,
+        args.elide,
+        args.lazy_functions,
+        config.keep_annotations,
+    )
+    if isinstance(rng, tape.Tape):
+        rng.where = bombast.path
+    return root, preprocess, bombast
 
-    bombast = Bombast(preprocess)
-    for _ in range(args.iters):
-        root = bombast.visit(root)
 
-    # Postprocessing
+def finish(root, obfuscator, args):
+    """Apply ``args.iters`` iterations of ``obfuscator`` to ``root`` and move
+    its imports to the top; returns the tree to emit."""
+    root = obfuscator.transform(root, args.iters)
     root.body.sort(key=lambda x: not isinstance(x, ast.Import))  # move imports
-    ast.fix_missing_locations(root)  # fix AST
-
-    print(ast.unparse(root), file=args.outfile)
-    args.outfile.close()
+    return root
+
+
+def obfuscate(args, config=None, rng=None):
+    """Obfuscate ``args.infile`` into ``args.outfile`` and close both."""
+    root, _, bombast = analyze(args, config, rng)
+    smap = None
+    if args.source_map:
+        smap = sourcemap.SourceMap(args.outfile.name, [args.infile.name])
+
+    cache = cache_path = None
+    if args.incremental:
+        cache_path = units_cache(args.infile.name, args.cache_dir)
+        cache = utils.load_json(cache_path, {})
+
+    if args.jobs is None and cache is None:
+        root = finish(root, bombast, args)
+        with trace.span("unparse"):  # streams to the output
+            emit.emit(root, args.outfile, smap, args.minify)
+    else:
+        root.body.sort(key=lambda x: not isinstance(x, ast.Import))  # move imports
+        with trace.span("shards", statements=len(root.body)):
+            parallel.obfuscate(
+                root,
+                bombast,
+                args.seed,
+                args.iters,
+                1 if args.jobs is None else args.jobs,
+                args.outfile,
+                smap,
+                args.minify,
+                cache,
+            )
+        if cache is not None:
+            utils.write_atomic(cache_path, json.dumps(cache))
+
+    with trace.span("write") as info:
+        print(file=args.outfile)
+        args.outfile.close()
+        if smap is not None:
+            with open(args.outfile.name + ".map", "w") as f:
+                f.write(smap.dumps())
+        if info is not None and os.path.isfile(args.outfile.name):
+            info["bytes"] = os.path.getsize(args.outfile.name)
     if args.show_translations:
-        for original, obfuscated in preprocess.mapping.items():
+        for original, obfuscated in bombast.mapping.items():
             print(original, "=", obfuscated)
 
 
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["batch"]:
+        return batch.main(argv[1:])
+    if argv[:1] == ["search"]:
+        return search.main(argv[1:])
+    if argv[:1] == ["variants"]:
+        return variants.main(argv[1:])
+    if argv[:1] == ["archive"]:
+        return archive.main(argv[1:])
+    if argv[:1] == ["coordinator"]:
+        return cluster.main(argv[1:])
+    if argv[:1] == ["worker"]:
+        return cluster.worker_main(argv[1:])
+    if argv[:1] == ["sourcemap"]:
+        return sourcemap.main(argv[1:])
+
+    parser = argparse.ArgumentParser(description="Obfuscate Python source code.")
+    parser.add_argument(
+        "infile", type=argparse.FileType("rb"), default=sys.stdin, help="input"
+    )
+    parser.add_argument(
+        "outfile",
+        nargs="?",
+        type=argparse.FileType("w"),
+        default="obfuscated.py",
+        help="output [default: obfuscated.py]",
+    )
+    add_arguments(parser)
+    tapes = parser.add_mutually_exclusive_group()
+    tapes.add_argument(
+        "--record-tape",
+        metavar="FILE",
+        help="write every random decision to FILE, see bombast.tape",
+    )
+    tapes.add_argument(
+        "--replay-tape",
+        metavar="FILE",
+        help="make the decisions in FILE instead of drawing them",
+    )
+    args = parser.parse_args(argv)
+    rng = None
+    if args.record_tape or args.replay_tape:
+        if args.jobs is not None or args.incremental:
+            parser.error("tapes cannot be used with --jobs or --incremental")
+        if args.record_tape:
+            rng = tape.Recorder(args.seed)
+        else:
+            try:
+                rng = tape.load(args.replay_tape)
+            except (OSError, tape.TapeError) as e:
+                parser.error(f"{args.replay_tape}: {e}")
+    try:
+        obfuscate(args, configure(args.config), rng)
+        if args.replay_tape:
+            rng.finish()
+    except tape.TapeError as e:
+        sys.exit(f"bombast: {args.replay_tape}: {e}")
+    if args.record_tape:
+        tape.save(args.record_tape, rng)
+
+
 if __name__ == "__main__":
     main()
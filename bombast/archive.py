@@ -0,0 +1,254 @@
+"""Obfuscate the modules of a wheel, sdist or zip into a new wheel or zip.
+
+Usage: bombast archive [options] INPUT OUTPUT
+
+Members are read from INPUT and written to OUTPUT in the same order, without
+unpacking them to disk. ``.py`` members are obfuscated by a pool of worker
+processes; a module that cannot be obfuscated is copied and reported. Other zip
+members are copied as they are stored, without being decompressed. OUTPUT is
+always a zip file, which is also the format of a wheel.
+
+If INPUT has a ``.dist-info/RECORD``, it is rewritten with the hashes and sizes
+of the new members; signatures of the old RECORD are dropped. ``--compile``
+adds the bytecode of each obfuscated module to its ``__pycache__``, as checked
+hash-based ``.pyc`` files, which stay valid after installation. With
+``--source-map``, each module's map is added next to it.
+"""
+
+import argparse
+import base64
+import concurrent.futures
+import copy
+import csv
+import hashlib
+import importlib.util
+import io
+import marshal
+import os
+import posixpath
+import struct
+import sys
+import tarfile
+import time
+import zipfile
+
+import bombast
+from bombast import emit, sourcemap
+
+_options = _config = None
+
+
+def record_hash(data):
+    """Return the RECORD hash of ``data``."""
+    digest = hashlib.sha256(data).digest()
+    return "sha256=" + base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def pyc(code, source):
+    """Return a checked hash-based ``.pyc`` of ``code`` compiled from
+    ``source``."""
+    flags = (0b11).to_bytes(4, "little")  # hash-based, checked
+    digest = importlib.util.source_hash(source)
+    return importlib.util.MAGIC_NUMBER + flags + digest + marshal.dumps(code)
+
+
+def cache_path(name):
+    """Return where the bytecode of the module ``name`` goes in an archive."""
+    directory, filename = posixpath.split(name)
+    stem = filename[: -len(".py")]
+    tag = sys.implementation.cache_tag
+    return posixpath.join(directory, "__pycache__", f"{stem}.{tag}.pyc")
+
+
+def _init(options):
+    global _options, _config
+    _options = options
+    _config = bombast.configure(options.config)
+
+
+def _run(task):
+    name, data = task
+    options = copy.copy(_options)
+    options.infile = io.BytesIO(data)
+    options.infile.name = name
+    try:
+        root, _, obfuscator = bombast.analyze(options, _config)
+        root = bombast.finish(root, obfuscator, options)
+        smap = sourcemap.SourceMap(name, [name]) if options.source_map else None
+        text = (emit.unparse(root, smap, options.minify) + "\n").encode()
+        code = None
+        if options.compile:
+            code = pyc(compile(text, name, "exec", dont_inherit=True), text)
+        return text, code, None if smap is None else smap.dumps().encode(), None
+    except RecursionError:
+        return None, None, None, "recursion too deep"
+    except Exception as e:
+        return None, None, None, f"{type(e).__name__}: {e}"
+
+
+class Reader(object):
+    """The regular-file members of a zip file or tarball, in order."""
+
+    def __init__(self, path):
+        if zipfile.is_zipfile(path):
+            self.zip = zipfile.ZipFile(path)
+            self.raw = open(path, "rb")
+            self.members = [i for i in self.zip.infolist() if not i.is_dir()]
+        else:
+            self.zip = None
+            self.members = []
+            self.data = {}
+            # Read the tarball in one pass, since compressed ones cannot seek.
+            with tarfile.open(path) as tar:
+                for member in tar:
+                    if member.isfile():
+                        self.members.append(member)
+                        self.data[member.name] = tar.extractfile(member).read()
+                    elif not member.isdir():
+                        print(
+                            f"skip {member.name}: not a regular file", file=sys.stderr
+                        )
+
+    def name(self, member):
+        return member.filename if self.zip else member.name
+
+    def read(self, member):
+        if self.zip:
+            return self.zip.read(member)
+        return self.data[member.name]
+
+    def info(self, member):
+        """Return a ZipInfo with the name, date and mode of ``member``."""
+        if self.zip:
+            info = zipfile.ZipInfo(member.filename, member.date_time)
+            info.external_attr = member.external_attr
+            info.create_system = member.create_system
+        else:
+            date_time = max((1980, 1, 1, 0, 0, 0), time.localtime(member.mtime)[:6])
+            info = zipfile.ZipInfo(member.name, date_time)
+            info.external_attr = (0o100000 | member.mode) << 16
+        info.compress_type = zipfile.ZIP_DEFLATED
+        return info
+
+    def copy(self, member, out):
+        """Copy ``member`` to the ZipFile ``out``, compressed as it is if it
+        comes from a zip file."""
+        if not self.zip:
+            out.writestr(self.info(member), self.read(member))
+            return
+        self.raw.seek(member.header_offset)
+        header = self.raw.read(zipfile.sizeFileHeader)
+        fields = struct.unpack(zipfile.structFileHeader, header)
+        self.raw.seek(fields[10] + fields[11], os.SEEK_CUR)  # name and extra
+        data = self.raw.read(member.compress_size)
+        info = copy.copy(member)
+        info.flag_bits &= ~0x08  # sizes go in the header, not a data descriptor
+        out.fp.seek(out.start_dir)
+        info.header_offset = out.fp.tell()
+        out.fp.write(info.FileHeader())
+        out.fp.write(data)
+        out.start_dir = out.fp.tell()
+        out.filelist.append(info)
+        out.NameToInfo[info.filename] = info
+        out._didModify = True
+
+    def close(self):
+        if self.zip:
+            self.zip.close()
+            self.raw.close()
+
+
+def records(reader):
+    """Return the RECORD member of ``reader`` and its rows by path, if any."""
+    for member in reader.members:
+        name = reader.name(member)
+        if name.endswith(".dist-info/RECORD") and name.count("/") == 1:
+            text = reader.read(member).decode()
+            return member, {row[0]: row for row in csv.reader(io.StringIO(text))}
+    return None, {}
+
+
+def rewrite(args):
+    """Obfuscate ``args.input`` into ``args.output``; return the failures."""
+    reader = Reader(args.input)
+    record, rows = records(reader)
+    signatures = set()
+    if record is not None:
+        name = reader.name(record)
+        signatures = {name + ".jws", name + ".p7s"}
+    modules = [m for m in reader.members if reader.name(m).endswith(".py")]
+    failures = {}
+
+    with concurrent.futures.ProcessPoolExecutor(
+        args.workers or None, initializer=_init, initargs=(args,)
+    ) as executor, zipfile.ZipFile(args.output, "w") as out:
+        tasks = ((reader.name(m), reader.read(m)) for m in modules)
+        results = executor.map(_run, tasks, chunksize=4)
+        written = []  # (name, hash, size), for the new RECORD
+
+        def add(info, data):
+            out.writestr(info, data)
+            written.append((info.filename, record_hash(data), str(len(data))))
+
+        for member in reader.members:
+            name = reader.name(member)
+            if member is record or name in signatures:
+                continue
+            if name.endswith(".py"):
+                text, code, smap, error = next(results)
+                if error is None:
+                    add(reader.info(member), text)
+                    if code is not None:
+                        info = reader.info(member)
+                        info.filename = cache_path(name)
+                        add(info, code)
+                    if smap is not None:
+                        info = reader.info(member)
+                        info.filename = name + ".map"
+                        add(info, smap)
+                    continue
+                failures[name] = error
+            reader.copy(member, out)
+            row = rows.get(name)
+            if row is None or len(row) < 3 or not row[1]:
+                data = reader.read(member)
+                row = [name, record_hash(data), str(len(data))]
+            written.append(tuple(row[:3]))
+
+        if record is not None:
+            lines = io.StringIO()
+            writer = csv.writer(lines, lineterminator="\n")
+            writer.writerows(written)
+            writer.writerow([reader.name(record), "", ""])
+            out.writestr(reader.info(record), lines.getvalue())
+    reader.close()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="bombast archive",
+        description="Obfuscate the modules of a wheel, sdist or zip file.",
+    )
+    parser.add_argument("input", help="wheel, sdist or zip file")
+    parser.add_argument("output", help="wheel or zip file to write")
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="add the bytecode of obfuscated modules to __pycache__",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="worker processes, 0 for all cores [default: 0]",
+    )
+    bombast.add_arguments(parser)
+    args = parser.parse_args(argv)
+    bombast.reject(parser, args, ["--jobs", "--incremental", "--show-translations"])
+
+    failures = rewrite(args)
+    for name, reason in failures.items():
+        print(f"FAIL {name}: {reason} (copied unchanged)", file=sys.stderr)
+    if failures:
+        sys.exit(1)
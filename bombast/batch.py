@@ -0,0 +1,314 @@
+"""Obfuscate many files with a pool of supervised worker processes.
+
+Usage: bombast batch -o OUTDIR [options] FILE_OR_DIR...
+
+Each file gets a wall-clock timeout. Workers run under an address space limit
+and are recycled after a number of files or once their resident memory passes
+a threshold. A file that times out, runs out of memory or kills its worker is
+retried with half as many iterations, as long as that leaves at least one;
+otherwise it fails. Failures are reported per file and do not stop the run.
+
+Files are dispatched longest first, as predicted by ``bombast.schedule`` from
+their features and the timings of earlier runs, which are then updated.
+``--trace`` and ``--progress`` record the run, see ``bombast.trace``.
+"""
+
+import argparse
+import collections
+import copy
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import time
+
+import bombast
+from bombast import schedule, trace
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+MB = 1 << 20
+
+Task = collections.namedtuple(
+    "Task", "path outfile iters attempt jobs", defaults=(None,)
+)
+
+
+def find_sources(paths):
+    """Yield the Python files in ``paths``, descending into directories."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(".py"):
+                    yield os.path.join(directory, filename)
+
+
+def sources(paths, root=None):
+    """Return the Python files in ``paths`` and their paths relative to
+    ``root``, by default the directory they have in common."""
+    paths = list(find_sources(paths))
+    if paths and root is None:
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+    return [(path, os.path.relpath(path, root)) for path in paths]
+
+
+def rss():
+    """Return the resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def serve(conn, args):
+    """Obfuscate the tasks received on ``conn`` until told to stop."""
+    if resource is not None and args.memory_limit:
+        limit = args.memory_limit * MB
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    config = bombast.configure(args.config)
+    if args.trace:
+        trace.start()
+    done = 0
+    while True:
+        task = conn.recv()
+        if task is None:
+            return
+        error = None
+        start = time.perf_counter()
+        try:
+            with trace.span("file", file=task.path, iters=task.iters):
+                run(task, args, config)
+        except (MemoryError, SystemError) as e:
+            # SystemError is how some allocation failures under RLIMIT_AS surface
+            error = f"out of memory ({type(e).__name__})"
+        except RecursionError:
+            error = "recursion too deep"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        done += 1
+        recycle = done >= args.max_files or (args.max_rss and rss() > args.max_rss * MB)
+        seconds = time.perf_counter() - start
+        conn.send((error, bool(recycle), seconds, trace.collect()))
+        if recycle:
+            return
+
+
+def run(task, args, config=None):
+    os.makedirs(os.path.dirname(task.outfile) or ".", exist_ok=True)
+    options = copy.copy(args)
+    options.infile = open(task.path, "rb")
+    options.outfile = open(task.outfile, "w")
+    options.iters = task.iters
+    if task.jobs:
+        options.jobs = max(task.jobs, options.jobs or 1)
+    bombast.obfuscate(options, config)
+
+
+class Worker(object):
+    def __init__(self, args):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=serve, args=(child, args))
+        self.process.start()
+        child.close()
+        self.task = None
+        self.deadline = None
+
+    def submit(self, task, timeout):
+        self.task = task
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.conn.send(task)
+
+    def stop(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+def retry(task, reason, pending, failures, args):
+    for path in (task.outfile, task.outfile + ".map"):
+        if os.path.exists(path):
+            os.remove(path)
+    if reason.startswith(("timed out", "out of memory", "recursion", "worker died")):
+        if task.attempt < args.retries and task.iters > 1:  # 0 would not obfuscate
+            iters = task.iters // 2
+            print(f"retry {task.path} --iters {iters}: {reason}", file=sys.stderr)
+            pending.appendleft(task._replace(iters=iters, attempt=task.attempt + 1))
+            return
+    failures[task.path] = reason
+
+
+def process(tasks, args, timings=None, monitor=None):
+    """Run ``tasks`` and return a mapping from failed paths to reasons.
+
+    The seconds taken by files done on their first attempt are added to
+    ``timings``, and the progress of every file is reported to ``monitor``.
+    """
+    pending = collections.deque(tasks)
+    failures = {}
+    timings = {} if timings is None else timings
+    workers = [Worker(args) for _ in range(min(args.workers, len(pending)))]
+    try:
+        _loop(workers, pending, failures, timings, monitor, args)
+    finally:
+        for worker in workers:
+            if worker.process.is_alive() and worker.task is None:
+                worker.conn.send(None)
+                worker.process.join()
+            worker.stop()
+    return failures
+
+
+def _loop(workers, pending, failures, timings, monitor, args):
+    while pending or any(w.task for w in workers):
+        for i, worker in enumerate(workers):
+            if worker.task is None and pending:
+                if not worker.process.is_alive():
+                    worker.stop()
+                    workers[i] = worker = Worker(args)
+                worker.submit(pending.popleft(), args.timeout)
+                if monitor is not None:
+                    monitor.start(i, worker.task)
+
+        busy = [w for w in workers if w.task]
+        deadlines = [w.deadline for w in busy if w.deadline is not None]
+        wait = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+        handles = [w.conn for w in busy] + [w.process.sentinel for w in busy]
+        ready = multiprocessing.connection.wait(handles, wait)
+
+        for i, worker in enumerate(workers):
+            task = worker.task
+            if task is None:
+                continue
+            events = None
+            if worker.conn in ready or worker.conn.poll():
+                error, recycle, seconds, events = worker.conn.recv()
+                worker.task = None
+                if error is not None:
+                    retry(task, error, pending, failures, args)
+                elif task.attempt == 0:
+                    timings[task.path] = seconds
+                if recycle:
+                    worker.process.join()
+            elif worker.process.sentinel in ready:
+                error = f"worker died (exit code {worker.process.exitcode})"
+                worker.stop()
+                workers[i] = Worker(args)
+                retry(task, error, pending, failures, args)
+            elif worker.deadline is not None and time.monotonic() >= worker.deadline:
+                error = f"timed out after {args.timeout}s"
+                worker.stop()
+                workers[i] = Worker(args)
+                retry(task, error, pending, failures, args)
+            else:
+                continue
+            if monitor is not None:
+                final = error is None or task.path in failures
+                monitor.finish(i, task, error, final, events)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="bombast batch", description="Obfuscate many Python files."
+    )
+    parser.add_argument("paths", nargs="+", help="files or directories")
+    parser.add_argument("-o", "--outdir", required=True, help="output directory")
+    parser.add_argument(
+        "--root", help="directory that outputs are relative to [default: common path]"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="worker processes [default: all cores]",
+    )
+    parser.add_argument(
+        "--timeout", type=float, help="seconds allowed per file [default: none]"
+    )
+    parser.add_argument(
+        "--memory-limit", type=int, help="address space limit per worker in MB"
+    )
+    parser.add_argument(
+        "--max-rss", type=int, help="recycle workers above this resident MB"
+    )
+    parser.add_argument(
+        "--max-files",
+        type=int,
+        default=100,
+        help="recycle workers after this many files [default: 100]",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=2,
+        help="retries with halved --iters after a timeout or crash [default: 2]",
+    )
+    parser.add_argument(
+        "--split",
+        type=int,
+        default=0,
+        metavar="NODES",
+        help="obfuscate files of at least NODES AST nodes in statement shards "
+        "[default: never]",
+    )
+    parser.add_argument(
+        "--trace", metavar="FILE", help="write a timeline of the run as a Chrome trace"
+    )
+    parser.add_argument(
+        "--progress",
+        type=int,
+        metavar="FD",
+        help="write JSON lines of progress events to file descriptor FD",
+    )
+    bombast.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    tasks = [
+        Task(path, os.path.join(args.outdir, relpath), args.iters, 0)
+        for path, relpath in sources(args.paths, args.root)
+    ]
+    if not tasks:
+        return
+
+    history = schedule.load(args.cache_dir)
+    model = schedule.Model(history)
+    entries = {}
+    for task in tasks:
+        key = os.path.abspath(task.path)
+        entry = schedule.describe(task.path, task.iters, history.get(key))
+        entry["predicted"] = model.predict(key, entry)
+        entries[task.path] = entry
+    tasks = schedule.plan(tasks, entries, args.workers, args.split)
+
+    monitor = None
+    if args.trace or args.progress is not None:
+        monitor = trace.Monitor(len(tasks), args.trace, args.progress)
+    start = time.monotonic()
+    timings = {}
+    failures = process(tasks, args, timings, monitor)
+    elapsed = time.monotonic() - start
+    if monitor is not None:
+        monitor.close()
+    for path, seconds in timings.items():
+        history[os.path.abspath(path)] = dict(entries[path], actual=seconds)
+    schedule.save(history, args.cache_dir)
+    if timings:
+        predicted = sum(entries[p]["predicted"] for p in timings)
+        print(
+            f"predicted {predicted:.1f}s of work, took {sum(timings.values()):.1f}s "
+            f"({elapsed:.1f}s on {args.workers} workers)",
+            file=sys.stderr,
+        )
+    for path, reason in failures.items():
+        print(f"FAIL {path}: {reason}", file=sys.stderr)
+    print(f"{len(tasks) - len(failures)} of {len(tasks)} files obfuscated")
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,478 @@
+"""Obfuscate many files with workers on several machines.
+
+Usage: bombast coordinator -o OUTDIR [options] FILE_OR_DIR...
+       bombast worker [--authkey KEY] HOST:PORT
+
+The coordinator parses each file and chooses its renamings, then sends the
+tree to a worker over TCP. The worker transforms and unparses it and sends back
+the text and the renamings. The coordinator writes the text under OUTDIR, and
+writes a ``mapping.json`` of every file, as ``bombast variants`` does. A file
+is transformed with the random state of a plain run, so its output is that of
+``bombast FILE`` whichever worker made it.
+
+Workers may join at any time. Each is sent up to ``--prefetch`` files. A worker
+that runs out of work takes the last file queued on the busiest worker. When a
+worker disconnects, its files are sent to other workers. A worker that spends
+more than ``--timeout`` seconds on a file stays connected, but that file and
+the ones queued behind it are sent to other workers, and it gets no more until
+it answers; after another ``--timeout`` without an answer, it is disconnected.
+Only the file that was running counts toward its ``--retries``. When every
+worker has left, the coordinator gives up if none joins within ``PATIENCE``
+seconds.
+
+Messages are pickled, so the coordinator and its workers must trust each other.
+They authenticate with the key in ``--authkey`` or ``$BOMBAST_AUTHKEY``, and
+must run the same versions of Python and bombast. ``--spawn N`` starts N workers
+on this machine that connect over loopback, which also tests a cluster on one
+host.
+"""
+
+import argparse
+import collections
+import copy
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import queue
+import secrets
+import sys
+import threading
+import time
+
+import bombast
+from bombast import batch, emit, sourcemap
+
+File = collections.namedtuple("File", "path relpath outfile")
+Setup = collections.namedtuple("Setup", "iters minify source_map")
+
+PATIENCE = 30  # seconds that workers keep trying to connect
+
+
+def parse_address(text):
+    """Parse ``HOST:PORT``; the host defaults to loopback."""
+    host, _, port = text.rpartition(":")
+    try:
+        return host or "127.0.0.1", int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HOST:PORT, got {text!r}")
+
+
+def get_authkey(key):
+    key = key or os.environ.get("BOMBAST_AUTHKEY")
+    return key.encode() if key else None
+
+
+def run(task, setup):
+    """Return the text, source map and renamings of a file sent as ``task``."""
+    _, path, outfile, tree = task
+    root, _, obfuscator = pickle.loads(tree)
+    root = bombast.finish(root, obfuscator, setup)
+    smap = sourcemap.SourceMap(outfile, [path]) if setup.source_map else None
+    text = emit.unparse(root, smap, setup.minify) + "\n"
+    return text, None if smap is None else smap.dumps(), obfuscator.mapping
+
+
+def connect(address, authkey, patience=PATIENCE):
+    """Connect to the coordinator, which may not be listening yet."""
+    deadline = time.monotonic() + patience
+    while True:
+        try:
+            return multiprocessing.connection.Client(address, authkey=authkey)
+        except ConnectionRefusedError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+
+def work(address, authkey):
+    """Obfuscate the files sent by the coordinator at ``address`` until it is
+    done with this worker."""
+    try:
+        conn = connect(address, authkey)
+    except (OSError, multiprocessing.AuthenticationError) as e:
+        print(f"cannot reach coordinator at {address}: {e}", file=sys.stderr)
+        return 1
+    with conn:
+        try:
+            setup = conn.recv()
+            tasks = collections.deque()
+            cancelled = set()
+            while True:
+                # Read every waiting message first, so files taken by other
+                # workers are cancelled before they are started.
+                while not tasks or conn.poll():
+                    message = conn.recv()
+                    if message is None:
+                        return 0
+                    kind, value = message
+                    if kind == "cancel":
+                        cancelled.add(value)
+                    else:
+                        tasks.append(value)
+                task = tasks.popleft()
+                if task[0] in cancelled:
+                    cancelled.discard(task[0])
+                    continue
+                try:
+                    result, error = run(task, setup), None
+                except RecursionError:
+                    result, error = None, "recursion too deep"
+                except Exception as e:
+                    result, error = None, f"{type(e).__name__}: {e}"
+                conn.send((task[0], error, result))
+        except (EOFError, ConnectionError):
+            print(f"lost the coordinator at {address}", file=sys.stderr)
+            return 1
+
+
+class Peer(object):
+    def __init__(self, conn):
+        self.conn = conn
+        self.tasks = []  # indices of the files sent, the first one running
+        self.since = time.monotonic()  # when the first file started or timed out
+        self.stuck = None  # the running file, if it timed out
+
+    def send(self, message):
+        self.conn.send(message)
+
+
+class Coordinator(object):
+    def __init__(self, files, args, config=None):
+        self.files = files
+        self.args = args
+        self.config = config
+        self.setup = Setup(args.iters, args.minify, args.source_map)
+        self.unanalyzed = iter(range(len(files)))
+        self.tasks = {}  # index -> task, kept until the file is done
+        self.pending = collections.deque()
+        self.attempts = collections.Counter()
+        self.finished = set()
+        self.failures = {}
+        self.mappings = {}
+        self.peers = []
+        self.deserted = None  # when the last worker left
+
+    def next_task(self):
+        """Return the index of the next file to send, analyzing it if needed."""
+        while True:
+            while self.pending:
+                index = self.pending.popleft()
+                if index not in self.finished:  # e.g. a timed-out file came back
+                    return index
+            index = next(self.unanalyzed, None)
+            if index is None:
+                return None
+            path = self.files[index].path
+            options = copy.copy(self.args)
+            options.infile = open(path, "rb")
+            try:
+                root, preprocess, obfuscator = bombast.analyze(options, self.config)
+            except Exception as e:
+                self.fail(index, f"{type(e).__name__}: {e}")
+                continue
+            tree = pickle.dumps((root, preprocess, obfuscator))
+            outfile = self.files[index].outfile
+            self.tasks[index] = (index, path, outfile, tree)
+            return index
+
+    def fail(self, index, reason):
+        self.finished.add(index)
+        self.failures[self.files[index].path] = reason
+        self.tasks.pop(index, None)
+
+    def assign(self, peer, index):
+        if not peer.tasks:
+            peer.since = time.monotonic()
+        peer.tasks.append(index)
+        try:
+            peer.send(("task", self.tasks[index]))
+        except OSError:
+            self.drop(peer, "worker disconnected")
+
+    def retry(self, index, reason):
+        """Send the file ``index`` to another worker, if it has retries left."""
+        self.attempts[index] += 1
+        path = self.files[index].path
+        if self.attempts[index] > self.args.retries:
+            self.fail(index, reason)
+        else:
+            print(f"redispatch {path}: {reason}", file=sys.stderr)
+            self.pending.appendleft(index)
+
+    def requeue(self, peer, reason):
+        """Send the files of ``peer`` to other workers; only the running one,
+        unless it already timed out, is charged an attempt."""
+        for position, index in reversed(list(enumerate(peer.tasks))):
+            if index in self.finished or index == peer.stuck:
+                continue
+            if position == 0:
+                self.retry(index, reason)
+            else:
+                self.pending.appendleft(index)
+
+    def drop(self, peer, reason):
+        """Disconnect ``peer`` and send its files to other workers."""
+        if peer not in self.peers:
+            return
+        self.peers.remove(peer)
+        peer.conn.close()
+        self.requeue(peer, reason)
+        if not self.peers:
+            self.deserted = time.monotonic()
+
+    def abandon(self, peer, reason):
+        """Send the files of ``peer`` to other workers, but leave it running
+        the first, whose result is still used if it comes first."""
+        self.requeue(peer, reason)
+        for index in peer.tasks[1:]:
+            try:
+                peer.send(("cancel", index))
+            except OSError:
+                pass  # noticed when its results are read
+        peer.stuck = peer.tasks[0]
+        peer.tasks = peer.tasks[:1]
+        peer.since = time.monotonic()
+
+    def dispatch(self):
+        for peer in sorted(self.peers, key=lambda p: len(p.tasks)):
+            if peer.stuck is not None:
+                continue
+            while peer in self.peers and len(peer.tasks) < self.args.prefetch:
+                index = self.next_task()
+                if index is None:
+                    break
+                self.assign(peer, index)
+        # Steal work queued on the busiest workers for idle ones.
+        for peer in [p for p in self.peers if not p.tasks]:
+            victim = max(self.peers, key=lambda p: len(p.tasks))
+            if len(victim.tasks) < 2:
+                break
+            index = victim.tasks.pop()
+            try:
+                victim.send(("cancel", index))
+            except OSError:
+                pass  # noticed when its results are read
+            self.assign(peer, index)
+
+    def receive(self, peer):
+        try:
+            index, error, result = peer.conn.recv()
+        except (EOFError, OSError):
+            self.drop(peer, "worker disconnected")
+            return
+        if index in peer.tasks:
+            peer.tasks.remove(index)
+        if index == peer.stuck:
+            peer.stuck = None
+        peer.since = time.monotonic()
+        if index in self.finished:
+            return  # also done by a worker that took it
+        if error is not None:
+            self.fail(index, error)
+            return
+        text, smap, mapping = result
+        file = self.files[index]
+        os.makedirs(os.path.dirname(file.outfile) or ".", exist_ok=True)
+        with open(file.outfile, "w") as f:
+            f.write(text)
+        if smap is not None:
+            with open(file.outfile + ".map", "w") as f:
+                f.write(smap)
+        self.mappings[file.relpath] = mapping
+        self.finished.add(index)
+        self.tasks.pop(index, None)
+
+    def expire(self):
+        """Take the files of workers that have spent too long on one, and drop
+        those that still have not answered after another timeout; return the
+        time until the next one would expire."""
+        if not self.args.timeout:
+            return None
+        now = time.monotonic()
+        wait = None
+        for peer in list(self.peers):
+            if not peer.tasks:
+                continue
+            left = peer.since + self.args.timeout - now
+            if left <= 0:
+                if peer.stuck is not None:
+                    self.drop(peer, f"no answer after {2 * self.args.timeout}s")
+                    continue
+                self.abandon(peer, f"timed out after {self.args.timeout}s")
+                left = self.args.timeout
+            wait = left if wait is None else min(wait, left)
+        return wait
+
+    def done(self):
+        return len(self.finished) == len(self.files)
+
+    def serve(self, arrivals, restart):
+        """Run until every file is done, adding workers from ``arrivals``.
+
+        ``restart`` is called while work remains, to replace local workers.
+        """
+        while not self.done():
+            while True:
+                try:
+                    peer = Peer(arrivals.get_nowait())
+                except queue.Empty:
+                    break
+                try:
+                    peer.send(self.setup)
+                except OSError:
+                    continue
+                self.peers.append(peer)
+                self.deserted = None
+            self.dispatch()
+            if self.done():
+                break
+            wait = self.expire()
+            wait = 0.2 if wait is None else min(wait, 0.2)
+            if not self.peers:
+                if (
+                    self.deserted is not None
+                    and time.monotonic() - self.deserted > PATIENCE
+                ):
+                    left = len(self.files) - len(self.finished)
+                    sys.exit(
+                        f"bombast coordinator: every worker left, {left} files "
+                        f"were not obfuscated"
+                    )
+                restart()
+                time.sleep(wait)
+                continue
+            ready = multiprocessing.connection.wait([p.conn for p in self.peers], wait)
+            for peer in list(self.peers):
+                if peer.conn in ready:
+                    self.receive(peer)
+            restart()
+        for peer in self.peers:
+            try:
+                peer.send(None)
+            except OSError:
+                pass
+            peer.conn.close()
+
+
+def _accept(listener, arrivals):
+    while True:
+        try:
+            arrivals.put(listener.accept())
+        except (multiprocessing.AuthenticationError, EOFError) as e:
+            print(f"rejected a worker: {e!r}", file=sys.stderr)
+        except OSError:
+            return  # the listener was closed
+
+
+def coordinate(files, args, config=None):
+    """Obfuscate ``files`` with workers and return the coordinator."""
+    authkey = get_authkey(args.authkey)
+    if authkey is None:
+        if not args.spawn:
+            sys.exit("bombast coordinator: --authkey or $BOMBAST_AUTHKEY is required")
+        authkey = secrets.token_hex(16).encode()
+    listener = multiprocessing.connection.Listener(args.listen, authkey=authkey)
+    host, port = listener.address
+    print(f"listening on {host}:{port}", file=sys.stderr)
+    arrivals = queue.Queue()
+    threading.Thread(target=_accept, args=(listener, arrivals), daemon=True).start()
+
+    local = (("127.0.0.1" if host in ("", "0.0.0.0") else host), port)
+    spawned = []
+
+    def restart():
+        for i, process in enumerate(spawned):
+            if process.exitcode is not None:
+                process.join()
+                spawned[i] = multiprocessing.Process(target=work, args=(local, authkey))
+                spawned[i].start()
+
+    for _ in range(args.spawn):
+        spawned.append(multiprocessing.Process(target=work, args=(local, authkey)))
+        spawned[-1].start()
+
+    coordinator = Coordinator(files, args, config)
+    try:
+        coordinator.serve(arrivals, restart)
+    finally:
+        listener.close()
+        for process in spawned:
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+    return coordinator
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="bombast coordinator",
+        description="Obfuscate Python files with workers on several machines.",
+    )
+    parser.add_argument("paths", nargs="+", help="files or directories")
+    parser.add_argument("-o", "--outdir", required=True, help="output directory")
+    parser.add_argument(
+        "--root", help="directory that outputs are relative to [default: common path]"
+    )
+    parser.add_argument(
+        "--listen",
+        type=parse_address,
+        default=("127.0.0.1", 0),
+        help="address to accept workers on [default: 127.0.0.1 and any port]",
+    )
+    parser.add_argument("--authkey", help="shared secret [default: $BOMBAST_AUTHKEY]")
+    parser.add_argument(
+        "--spawn", type=int, default=0, help="local workers to start [default: 0]"
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=2,
+        help="files sent to a worker ahead of time [default: 2]",
+    )
+    parser.add_argument(
+        "--timeout", type=float, help="seconds allowed per file [default: none]"
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=2,
+        help="times a file is sent again after its worker is lost [default: 2]",
+    )
+    bombast.add_arguments(parser)
+    args = parser.parse_args(argv)
+    bombast.reject(parser, args, ["--jobs", "--incremental", "--show-translations"])
+    config = bombast.configure(args.config)
+
+    files = [
+        File(path, relpath, os.path.join(args.outdir, relpath))
+        for path, relpath in batch.sources(args.paths, args.root)
+    ]
+    if not files:
+        return
+
+    coordinator = coordinate(files, args, config)
+    os.makedirs(args.outdir, exist_ok=True)
+    with open(os.path.join(args.outdir, "mapping.json"), "w") as f:
+        mappings = dict(sorted(coordinator.mappings.items()))
+        json.dump({"seed": args.seed, "files": mappings}, f, indent=2)
+    for path, reason in coordinator.failures.items():
+        print(f"FAIL {path}: {reason}", file=sys.stderr)
+    print(f"{len(files) - len(coordinator.failures)} of {len(files)} files obfuscated")
+    if coordinator.failures:
+        sys.exit(1)
+
+
+def worker_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="bombast worker", description="Obfuscate files for a coordinator."
+    )
+    parser.add_argument("address", type=parse_address, help="coordinator HOST:PORT")
+    parser.add_argument("--authkey", help="shared secret [default: $BOMBAST_AUTHKEY]")
+    args = parser.parse_args(argv)
+    authkey = get_authkey(args.authkey)
+    if authkey is None:
+        sys.exit("bombast worker: --authkey or $BOMBAST_AUTHKEY is required")
+    sys.exit(work(args.address, authkey))
@@ -0,0 +1,164 @@
+"""Differential testing: obfuscated programs must behave like the originals.
+
+Each program is obfuscated for every (seed, iters) pair. The original and the
+obfuscated program run in separate subprocesses, each in its own temporary
+directory, and their stdout and exit codes are compared. Failing cases are
+minimized by deleting top-level statements while the mismatch persists, and
+the reduced program is written as a reproducer.
+
+Usage: python -m bombast.difftest --seeds 0-99 --iters 1-3 tests/*.py
+       python -m bombast.difftest --options="--minify --elide" tests/*.py
+
+``--options`` takes the ``=`` form, since its value starts with a dash.
+"""
+
+import argparse
+import ast
+import concurrent.futures
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import bombast
+
+
+def numbers(spec):
+    """Parse a list of integers like ``0-9,20``."""
+    result = []
+    for part in spec.split(","):
+        first, _, last = part.partition("-")
+        result.extend(range(int(first), int(last or first) + 1))
+    return result
+
+
+def execute(path, timeout):
+    """Run the program at ``path`` and return (exit code, stdout)."""
+    with tempfile.TemporaryDirectory() as cwd:
+        try:
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(path)],
+                cwd=cwd,
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            return "timeout", b""
+    return proc.returncode, proc.stdout
+
+
+def check(source, seed, iters, options, timeout, expected=None):
+    """Return a description of how the obfuscated ``source`` misbehaves."""
+    with tempfile.TemporaryDirectory() as tmp:
+        original = os.path.join(tmp, "original.py")
+        obfuscated = os.path.join(tmp, "obfuscated.py")
+        with open(original, "w") as f:
+            f.write(source)
+        if expected is None:
+            expected = execute(original, timeout)
+        argv = [original, obfuscated, "--seed", str(seed), "--iters", str(iters)]
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                bombast.main(argv + options)
+        except (Exception, SystemExit) as e:
+            return f"obfuscation failed: {e!r}"
+        actual = execute(obfuscated, timeout)
+    if actual[0] != expected[0]:
+        return f"exit code {actual[0]}, expected {expected[0]}"
+    if actual[1] != expected[1]:
+        return "stdout differs"
+    return None
+
+
+def minimize(source, seed, iters, options, timeout):
+    """Delete top-level statements from ``source`` while ``check`` fails."""
+    body = ast.parse(source).body
+    chunk = len(body) // 2
+    while chunk:
+        i = 0
+        while i < len(body):
+            candidate = body[:i] + body[i + chunk :]
+            module = ast.Module(body=candidate or [ast.Pass()], type_ignores=[])
+            text = ast.unparse(module)
+            if check(text, seed, iters, options, timeout):
+                body, source = candidate, text
+            else:
+                i += chunk
+        chunk //= 2
+    return source
+
+
+def run_case(case):
+    path, source, expected, seed, iters, options, timeout, reduce = case
+    error = check(source, seed, iters, options, timeout, expected)
+    if error is None:
+        return path, seed, iters, None, None
+    reproducer = minimize(source, seed, iters, options, timeout) if reduce else None
+    return path, seed, iters, error, reproducer
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that obfuscated programs behave like the originals."
+    )
+    parser.add_argument("programs", nargs="+", help="programs to obfuscate")
+    parser.add_argument("--seeds", type=numbers, default=[0], help="e.g. 0-99")
+    parser.add_argument("--iters", type=numbers, default=[1], help="e.g. 1-3")
+    parser.add_argument(
+        "--options",
+        default="",
+        help="extra bombast options, e.g. --options='--minify'",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=0, help="parallel cases [default: all cores]"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=60, help="seconds per run [default: 60]"
+    )
+    parser.add_argument(
+        "--reproducers", default="reproducers", help="directory for reproducers"
+    )
+    parser.add_argument(
+        "--no-minimize", action="store_true", help="do not minimize failures"
+    )
+    args = parser.parse_args()
+    options = args.options.split()
+
+    start = time.perf_counter()
+    cases = []
+    for path in args.programs:
+        with open(path) as f:
+            source = f.read()
+        expected = execute(path, args.timeout)
+        for seed in args.seeds:
+            for iters in args.iters:
+                case = (path, source, expected, seed, iters, options, args.timeout)
+                cases.append(case + (not args.no_minimize,))
+
+    failures = []
+    with concurrent.futures.ProcessPoolExecutor(args.jobs or None) as executor:
+        for path, seed, iters, error, reproducer in executor.map(run_case, cases):
+            if error is None:
+                continue
+            failures.append((path, seed, iters))
+            print(f"FAIL {path} --seed {seed} --iters {iters}: {error}")
+            if reproducer is not None:
+                name = os.path.splitext(os.path.basename(path))[0]
+                out = os.path.join(args.reproducers, f"{name}-s{seed}-i{iters}.py")
+                os.makedirs(args.reproducers, exist_ok=True)
+                with open(out, "w") as f:
+                    f.write(f"# bombast --seed {seed} --iters {iters} {args.options}\n")
+                    f.write(reproducer + "\n")
+                print(f"     reproducer: {out}")
+
+    elapsed = time.perf_counter() - start
+    print(f"{len(cases)} cases, {len(failures)} failures in {elapsed:.1f}s")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
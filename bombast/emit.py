@@ -0,0 +1,157 @@
+"""Emit source code for the trees bombast produces.
+
+``Emitter`` is an ``ast.unparse`` with fast paths for the node shapes the
+transformations generate: numbers, strings, names, calls and arithmetic. Output
+is identical to ``ast.unparse`` by default, but is written to a stream in
+chunks instead of being joined into one string. ``minify`` uses one-space
+indents, no blank lines and no spaces around arithmetic operators.
+"""
+
+import ast
+import math
+
+try:
+    from ast import _Precedence, _Unparser
+except ImportError:  # Python 3.14+
+    from _ast_unparse import _Precedence, Unparser as _Unparser
+
+_binops = {}
+for _name, _op in _Unparser.binop.items():
+    _precedence = _Unparser.binop_precedence[_op]
+    if _op in _Unparser.binop_rassoc:
+        _sides = (_precedence.next(), _precedence)
+    else:
+        _sides = (_precedence, _precedence.next())
+    _binops[getattr(ast, _name)] = (f" {_op} ", _op, _precedence) + _sides
+
+_TEST, _POWER, _ATOM = _Precedence.TEST, _Precedence.POWER, _Precedence.ATOM
+
+
+class Emitter(_Unparser):
+    """An ``ast.unparse`` that writes to ``stream`` and records statements.
+
+    If ``smap`` is a ``SourceMap``, a segment is added for every statement.
+    """
+
+    chunks = 8192
+
+    def __init__(self, stream=None, smap=None, minify=False, **kwargs):
+        super().__init__(**kwargs)
+        self.stream = stream
+        self.smap = smap
+        self.minify = minify
+        self.indent = " " if minify else "    "
+        self.separator = "," if minify else ", "
+        self._raw_strings = not getattr(self, "_avoid_backslashes", False)
+        self._written = False
+        self._line = self._column = 0
+        self._pending = None
+
+    def visit(self, node):
+        self._source = []
+        self.traverse(node)
+        if self.stream is None:
+            return "".join(self._source)
+        self.flush()
+
+    def flush(self):
+        self.stream.write("".join(self._source))
+        self._source = []
+
+    def write(self, *text):
+        if self.smap is not None:
+            for chunk in text:
+                newlines = chunk.count("\n")
+                if newlines:
+                    self._line += newlines
+                    self._column = len(chunk) - chunk.rindex("\n") - 1
+                else:
+                    self._column += len(chunk)
+        self._source.extend(text)
+        self._written = True
+        if self.stream is not None and len(self._source) >= self.chunks:
+            self.flush()
+
+    def traverse(self, node):
+        if isinstance(node, (ast.stmt, ast.excepthandler)):
+            self._pending = node
+        super().traverse(node)
+
+    def maybe_newline(self):
+        if self._written and not self.minify:
+            self.write("\n")
+
+    def fill(self, text="", **kwargs):
+        if self._written:
+            self.write("\n")
+        self.write(self.indent * self._indent)
+        if self._pending is not None:
+            node, self._pending = self._pending, None
+            if self.smap is not None and getattr(node, "lineno", None) is not None:
+                self.smap.add(
+                    self._line, self._column, node.lineno - 1, node.col_offset
+                )
+        self.write(text)
+
+    def get_precedence(self, node):
+        # Each node's precedence is read once, so it is not kept around.
+        return self._precedences.pop(node, _TEST)
+
+    def visit_Name(self, node):
+        self._precedences.pop(node, None)
+        self.write(node.id)
+
+    def visit_Constant(self, node):
+        value = node.value
+        kind = type(value)
+        if kind is int or kind is float and math.isfinite(value):
+            text = repr(value)
+            if self._precedences.pop(node, _TEST) > _POWER and text[0] == "-":
+                text = f"({text})"
+            self.write(text)
+        elif kind is str and self._raw_strings and node.kind is None:
+            self._precedences.pop(node, None)
+            self.write(repr(value))
+        else:
+            super().visit_Constant(node)
+
+    def visit_BinOp(self, node):
+        spaced, op, precedence, left, right = _binops[type(node.op)]
+        parens = self._precedences.pop(node, _TEST) > precedence
+        if parens:
+            self.write("(")
+        self._precedences[node.left] = left
+        self.traverse(node.left)
+        self.write(op if self.minify else spaced)
+        self._precedences[node.right] = right
+        self.traverse(node.right)
+        if parens:
+            self.write(")")
+
+    def visit_Call(self, node):
+        self._precedences.pop(node, None)
+        self._precedences[node.func] = _ATOM
+        self.traverse(node.func)
+        self.write("(")
+        comma = False
+        for e in node.args:
+            if comma:
+                self.write(self.separator)
+            comma = True
+            self.traverse(e)
+        for e in node.keywords:
+            if comma:
+                self.write(self.separator)
+            comma = True
+            self.traverse(e)
+        self.write(")")
+
+
+def emit(node, stream, smap=None, minify=False):
+    """Write the source of ``node`` to ``stream``."""
+    Emitter(stream, smap, minify).visit(node)
+
+
+def unparse(node, smap=None, minify=False):
+    """Return the source of ``node``."""
+    return Emitter(None, smap, minify).visit(node)
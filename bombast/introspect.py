@@ -0,0 +1,167 @@
+"""Collect the names of imported modules so they are never renamed.
+
+``Preprocess`` only knows the builtins and ``ignore_names``, so attributes of
+third-party objects get renamed. This imports each module the source imports in
+an isolated subprocess, collects its public names and the public attributes of
+its members, and caches the result on disk keyed by the package version.
+Modules that fail to import are not cached, so they are tried again next time.
+"""
+
+import ast
+import collections
+import importlib.metadata
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import sysconfig
+
+from bombast import utils
+
+_script = """
+import importlib, json, sys
+out, sys.stdout = sys.stdout, sys.stderr
+def public(obj):
+    try:
+        return [n for n in dir(obj) if not n.startswith("_") or n.startswith("__")]
+    except Exception:
+        return []
+result = {}
+for name in sys.argv[1:]:
+    try:
+        module = importlib.import_module(name)
+    except BaseException:
+        continue
+    names = set(public(module))
+    for attr in list(names):
+        try:
+            names.update(public(getattr(module, attr)))
+        except Exception:
+            pass
+    result[name] = sorted(names)
+json.dump(result, out)
+"""
+
+
+def imported_modules(root):
+    """Return the top-level names of the absolute imports in ``root``."""
+    modules = set()
+    for node in ast.walk(root):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules.add(node.module.split(".")[0])
+    return modules
+
+
+def in_stdlib(module):
+    """Return whether the top-level module ``module`` is in the standard
+    library."""
+    if hasattr(sys, "stdlib_module_names"):  # Python 3.10+
+        return module in sys.stdlib_module_names
+    if module in sys.builtin_module_names:
+        return True
+    try:
+        spec = importlib.util.find_spec(module)
+    except (ImportError, ValueError):
+        return False
+    if spec is None or not spec.origin:
+        return False
+    if spec.origin == "frozen":
+        return True
+    origin = os.path.realpath(spec.origin)
+    if "site-packages" in origin.split(os.sep):
+        return False
+    paths = sysconfig.get_paths()
+    for key in ("stdlib", "platstdlib"):
+        if origin.startswith(os.path.realpath(paths[key]) + os.sep):
+            return True
+    return False
+
+
+def packages_distributions():
+    """Return the names of the distributions that provide each top-level
+    module, like ``importlib.metadata.packages_distributions`` in Python 3.10+.
+    """
+    if hasattr(importlib.metadata, "packages_distributions"):
+        return importlib.metadata.packages_distributions()
+    packages = collections.defaultdict(list)
+    for dist in importlib.metadata.distributions():
+        top_level = (dist.read_text("top_level.txt") or "").split()
+        if not top_level:
+            top_level = {
+                f.parts[0] if len(f.parts) > 1 else f.with_suffix("").name
+                for f in dist.files or ()
+                if f.suffix == ".py"
+            }
+        for module in top_level:
+            packages[module].append(dist.metadata["Name"])
+    return dict(packages)
+
+
+def module_version(module, packages=None):
+    """Return a cache key for the installed version of ``module``, or None.
+
+    ``packages`` is the result of ``packages_distributions``, which is found
+    if it is not given.
+    """
+    python = "py{}.{}".format(*sys.version_info)
+    if in_stdlib(module):
+        return "{}-stdlib-{}.{}.{}".format(python, *sys.version_info)
+    if packages is None:
+        packages = packages_distributions()
+    versions = []
+    for dist in sorted(set(packages.get(module, ()))):
+        try:
+            versions.append(f"{dist}-{importlib.metadata.version(dist)}")
+        except importlib.metadata.PackageNotFoundError:
+            pass
+    if not versions:
+        return None
+    return "-".join([python] + versions)
+
+
+def introspect(modules, timeout=60):
+    """Import ``modules`` in a subprocess and return their names by module."""
+    if not modules:
+        return {}
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-I", "-c", _script, *modules],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+        return json.loads(proc.stdout)
+    except (subprocess.TimeoutExpired, ValueError):
+        print("Warning: could not introspect", *modules, file=sys.stderr)
+        return {}
+
+
+def ignores(root, cache_dir=None):
+    """Return the names to ignore for the installed modules ``root`` imports.
+
+    Modules that are neither in the standard library nor provided by an
+    installed distribution are skipped.
+    """
+    directory = os.path.join(cache_dir or utils.cache_dir(), "ignores")
+    names, missing = set(), {}
+    packages = None
+    for module in sorted(imported_modules(root)):
+        if packages is None and not in_stdlib(module):
+            packages = packages_distributions()  # scans every distribution
+        version = module_version(module, packages)
+        if version is None:
+            continue
+        path = os.path.join(directory, f"{module}-{version}.json")
+        try:
+            with open(path) as f:
+                names.update(json.load(f))
+        except (OSError, ValueError):
+            missing[module] = path
+    for module, module_names in introspect(list(missing)).items():
+        names.update(module_names)
+        utils.write_atomic(missing[module], json.dumps(module_names))
+    return names
@@ -0,0 +1,85 @@
+"""Rewrite module-level imports into lazily loaded module proxies.
+
+``import a.b`` becomes ``a = _bombast_lazy_import('a.b', False)``. The proxy
+imports the module on first attribute access, caches it, and replaces itself in
+the module's globals so later accesses go straight to the module. The helper is
+added to the module before ``Preprocess`` runs, so it is obfuscated like the
+rest of the program.
+
+Module-level imports lose their import-time side effects until first use;
+``from`` imports and imports inside functions are left alone.
+"""
+
+import ast
+
+from bombast import utils
+
+HELPER = "_bombast_lazy_import"
+
+_helper_source = f"""
+def {HELPER}(name, submodule):
+    module = None
+
+    def load():
+        nonlocal module
+        if module is None:
+            module = __import__(name)
+            if submodule:
+                # getattr, since the attribute would be renamed like any other
+                for part in getattr(name, "split")(".")[1:]:
+                    module = getattr(module, part)
+            namespace = globals()
+            for key, value in list(getattr(namespace, "items")()):
+                if value is proxy:
+                    namespace[key] = module
+        return module
+
+    class LazyModule:
+        def __getattr__(self, attr):
+            return getattr(load(), attr)
+
+        def __setattr__(self, attr, value):
+            setattr(load(), attr, value)
+
+        def __delattr__(self, attr):
+            delattr(load(), attr)
+
+        def __dir__(self):
+            return dir(load())
+
+        def __repr__(self):
+            return repr(load())
+
+    proxy = LazyModule()
+    return proxy
+"""
+
+
+def add_helper(root):
+    """Insert the proxy helper into ``root`` if it has imports."""
+    if any(isinstance(node, ast.Import) for node in root.body):
+        utils.insert_helper(root, ast.parse(_helper_source).body)
+
+
+def rewrite(root):
+    """Replace the module-level imports of ``root`` with lazy proxies."""
+    body = []
+    for node in root.body:
+        if not isinstance(node, ast.Import):
+            body.append(node)
+            continue
+        for alias in node.names:
+            target = alias.asname or alias.name.split(".")[0]
+            assign = ast.Assign(
+                targets=[ast.Name(id=target, ctx=ast.Store())],
+                value=ast.Call(
+                    func=ast.Name(id=HELPER, ctx=ast.Load()),
+                    args=[
+                        ast.Constant(value=alias.name),
+                        ast.Constant(value=alias.asname is not None),
+                    ],
+                    keywords=[],
+                ),
+            )
+            body.append(ast.fix_missing_locations(ast.copy_location(assign, node)))
+    root.body = body
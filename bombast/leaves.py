@@ -0,0 +1,93 @@
+"""Shared instances of immutable leaf nodes.
+
+Transformed trees are dominated by tiny repeated leaves: contexts, operators,
+names like ``chr`` and small constants. The functions here return one shared
+node per distinct leaf instead of allocating a new one at every use, the way
+``ast.parse`` already shares contexts and operators. Contexts and operators are
+shared by every run; names and constants are interned in the ``Leaves`` of one
+run, which its ``Bombast`` owns, so concurrent runs never share a table.
+
+Shared names and constants must never be mutated and carry no location;
+``utils.locate`` leaves them alone. Emission does not need their locations, but
+``unshare`` copies them into located nodes for trees that are compiled.
+"""
+
+import ast
+
+LOAD, STORE, DEL = ast.Load(), ast.Store(), ast.Del()
+_contexts = {ast.Load: LOAD, ast.Store: STORE, ast.Del: DEL}
+
+_operators = {
+    cls: cls()
+    for base in (ast.operator, ast.unaryop, ast.boolop, ast.cmpop)
+    for cls in base.__subclasses__()
+}
+ADD, MULT = _operators[ast.Add], _operators[ast.Mult]
+
+
+def op(cls):
+    """Return the shared instance of the operator class ``cls``."""
+    return _operators[cls]
+
+
+class Leaves(object):
+    """The shared names and constants of one run."""
+
+    __slots__ = ("names", "constants")
+
+    def __init__(self):
+        self.names = {}
+        self.constants = {}
+
+    def name(self, id, ctx=LOAD):
+        """Return a shared ``Name``."""
+        key = (id, type(ctx))
+        node = self.names.get(key)
+        if node is None:
+            node = self.names[key] = ast.Name(id=id, ctx=_contexts[type(ctx)])
+            node._shared = True
+        return node
+
+    def constant(self, value):
+        """Return a shared ``Constant`` if ``value`` is small, else a new one."""
+        kind = type(value)
+        if kind is int and -1024 <= value <= 1024 or kind is str and len(value) <= 3:
+            key = (kind, value)
+            node = self.constants.get(key)
+            if node is None:
+                node = self.constants[key] = ast.Constant(value=value)
+                node._shared = True
+            return node
+        return ast.Constant(value=value)
+
+
+def is_shared(node):
+    return node.__dict__.get("_shared", False)
+
+
+def unshare(root):
+    """Replace shared leaves in ``root`` with copies located at their parent."""
+    stack = [(root, root)]
+    while stack:
+        parent, located = stack.pop()
+        if getattr(parent, "lineno", None) is not None:
+            located = parent
+        for field, value in ast.iter_fields(parent):
+            if isinstance(value, list):
+                for i, child in enumerate(value):
+                    if isinstance(child, ast.AST):
+                        if is_shared(child):
+                            value[i] = _copy(child, located)
+                        else:
+                            stack.append((child, located))
+            elif isinstance(value, ast.AST):
+                if is_shared(value):
+                    setattr(parent, field, _copy(value, located))
+                else:
+                    stack.append((value, located))
+    return root
+
+
+def _copy(node, located):
+    copy = type(node)(**dict(ast.iter_fields(node)))
+    return ast.copy_location(copy, located)
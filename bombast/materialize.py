@@ -0,0 +1,115 @@
+"""Compile module-level functions ahead of time and define them on first call.
+
+After the last iteration, each plain module-level function is compiled, and its
+code object is marshaled, optionally compressed with zlib, and encoded with
+base85. The ``def`` becomes ``f = _bombast_materialize('f', '...', ...)``,
+which binds a stub. The stub builds the real function on its first call and
+replaces itself in the module's globals. Default values are still evaluated
+when the stub is defined.
+
+Functions with decorators or annotations, async functions and the helpers
+bombast adds, such as the constant pool's, are left alone. The helper is never
+pooled, since it runs before the pool is defined.
+Marshaled code only loads on the Python version that ran bombast; the module
+raises ImportError on any other.
+"""
+
+import ast
+import base64
+import marshal
+import sys
+import zlib
+
+from bombast import leaves, pool, utils
+
+HELPER = "_bombast_materialize"
+
+_tag = sys.implementation.cache_tag
+
+_helper_source = f"""
+if getattr(getattr(__import__("sys"), "implementation"), "cache_tag") != {_tag!r}:
+    raise ImportError("this module was obfuscated for {_tag}")
+
+
+def {HELPER}(name, data, compressed, defaults, kwdefaults):
+    function = None
+
+    def stub(*args, **kwargs):
+        nonlocal function
+        if function is None:
+            code = getattr(__import__("base64"), "b85decode")(data)
+            if compressed:
+                code = getattr(__import__("zlib"), "decompress")(code)
+            code = getattr(__import__("marshal"), "loads")(code)
+            function = type(stub)(code, globals(), name, defaults)
+            function.__kwdefaults__ = kwdefaults
+            namespace = globals()
+            # getattr, since the attribute would be renamed like any other
+            if getattr(namespace, "get")(name) is stub:
+                namespace[name] = function
+        return function(*args, **kwargs)
+
+    stub.__name__ = stub.__qualname__ = name
+    return stub
+"""
+
+
+def add_helper(root):
+    """Add the helper to ``root`` if it has module-level functions."""
+    if any(isinstance(node, ast.FunctionDef) for node in root.body):
+        helper = ast.parse(_helper_source).body
+        pool.exclude(helper)
+        utils.insert_helper(root, helper)
+
+
+def lazy(node):
+    """Return whether the module-level statement ``node`` can be deferred."""
+    if not isinstance(node, ast.FunctionDef) or node.decorator_list:
+        return False
+    args = node.args
+    every = args.posonlyargs + args.args + args.kwonlyargs
+    every += [arg for arg in (args.vararg, args.kwarg) if arg is not None]
+    return node.returns is None and all(arg.annotation is None for arg in every)
+
+
+def rewrite(root, helper, compress=False, keep=()):
+    """Replace the functions of ``root`` with stubs created by ``helper``,
+    except those named in ``keep``."""
+    for i, node in enumerate(root.body):
+        if not lazy(node) or node.name == helper or node.name in keep:
+            continue
+        defaults = ast.Tuple(elts=node.args.defaults, ctx=leaves.LOAD)
+        keys, values = [], []
+        for arg, default in zip(node.args.kwonlyargs, node.args.kw_defaults):
+            if default is not None:
+                keys.append(ast.Constant(value=arg.arg))
+                values.append(default)
+        kwdefaults = ast.Dict(keys=keys, values=values) if keys else None
+        node.args.defaults = []
+        node.args.kw_defaults = [None] * len(node.args.kwonlyargs)
+
+        module = leaves.unshare(ast.Module(body=[node], type_ignores=[]))
+        code = compile(module, "<bombast>", "exec")
+        code = next(c for c in code.co_consts if hasattr(c, "co_code"))
+        # Later versions only share objects whose reference count is above
+        # one, which other threads can change, so the output would vary.
+        data = marshal.dumps(code, 2)
+        if compress:
+            data = zlib.compress(data, 9)
+        call = ast.Call(
+            func=ast.Name(id=helper, ctx=leaves.LOAD),
+            args=[
+                ast.Constant(value=node.name),
+                ast.Constant(value=base64.b85encode(data).decode()),
+                ast.Constant(value=compress),
+                defaults,
+                kwdefaults or ast.Constant(value=None),
+            ],
+            keywords=[],
+        )
+        assign = ast.Assign(
+            targets=[ast.Name(id=node.name, ctx=ast.Store())], value=call
+        )
+        utils.locate(assign, node)
+        root.body[i] = assign
+    return root
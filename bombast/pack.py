@@ -0,0 +1,140 @@
+"""Encode large constant tables as one compressed payload.
+
+A list, tuple, set or dict display made only of constants, or a bytes constant,
+whose marshaled size is at least the threshold becomes a call like
+``_bombast_unpack('m', '...')``: the marshaled value, compressed with zlib and
+encoded with base85. Flat lists and tuples of ints or floats are packed with
+``array`` instead. Only module and class level code is rewritten, since it runs
+once at import; tables in functions would be decoded at every call.
+
+The marshal format is that of the Python running bombast, which older Pythons
+may not read.
+"""
+
+import ast
+import array
+import base64
+import marshal
+import sys
+import zlib
+
+from bombast import utils
+
+HELPER = "_bombast_unpack"
+
+_helper_source = f"""
+def {HELPER}(kind, data):
+    data = getattr(__import__("zlib"), "decompress")(
+        getattr(__import__("base64"), "b85decode")(data)
+    )
+    if kind == "m":
+        return getattr(__import__("marshal"), "loads")(data)
+    values = getattr(__import__("array"), "array")(kind, data)
+    if getattr(__import__("sys"), "byteorder") == "big":
+        getattr(values, "byteswap")()
+    return list(values)
+"""
+
+_literals = (str, bytes, int, float, complex, bool, type(None), type(...))
+
+
+def literal(node):
+    """Return the value of ``node`` if it is made only of constants.
+
+    Raises ValueError otherwise.
+    """
+    if isinstance(node, ast.Constant) and type(node.value) in _literals:
+        return node.value
+    if isinstance(node, ast.List):
+        return [literal(e) for e in node.elts]
+    if isinstance(node, ast.Tuple):
+        return tuple(literal(e) for e in node.elts)
+    if isinstance(node, ast.Set):
+        return {literal(e) for e in node.elts}
+    if isinstance(node, ast.Dict) and None not in node.keys:
+        return {literal(k): literal(v) for k, v in zip(node.keys, node.values)}
+    raise ValueError("not a constant")
+
+
+def _typecode(values):
+    """Return the smallest ``array`` typecode that holds ``values``, if any."""
+    kinds = set(map(type, values))
+    if kinds == {float}:
+        return "d"
+    if kinds == {int}:
+        low, high = min(values), max(values)
+        for typecode in "bhiq":
+            bits = 8 * array.array(typecode).itemsize - 1
+            if -(1 << bits) <= low and high < 1 << bits:
+                return typecode
+    return None
+
+
+def encode(value):
+    """Return the arguments to the helper that decode to ``value``."""
+    typecode = None
+    if type(value) in (list, tuple) and value:
+        typecode = _typecode(value)
+    if typecode is None:
+        kind, data = "m", marshal.dumps(value)
+    else:
+        packed = array.array(typecode, value)
+        if sys.byteorder == "big":
+            packed.byteswap()
+        kind, data = typecode, packed.tobytes()
+    return kind, base64.b85encode(zlib.compress(data, 9)).decode()
+
+
+class Packer(ast.NodeTransformer):
+    def __init__(self, threshold):
+        super().__init__()
+        self.threshold = threshold
+        self.packed = 0
+
+    def visit_FunctionDef(self, node):
+        return node
+
+    visit_AsyncFunctionDef = visit_Lambda = visit_FunctionDef
+
+    def visit_Expr(self, node):
+        if isinstance(node.value, ast.Constant):
+            return node  # docstrings
+        return self.generic_visit(node)
+
+    def generic_visit(self, node):
+        if isinstance(node, getattr(ast, "pattern", ())):
+            return node  # match patterns only take literals
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set, ast.Dict, ast.Constant)):
+            try:
+                value = literal(node)
+            except (ValueError, TypeError):  # TypeError: unhashable key
+                return super().generic_visit(node)
+            if isinstance(node, ast.Constant) and type(value) is not bytes:
+                return node
+            if len(marshal.dumps(value)) >= self.threshold:
+                return self.pack(node, value)
+            return node
+        return super().generic_visit(node)
+
+    def pack(self, node, value):
+        self.packed += 1
+        kind, data = encode(value)
+        call = ast.Call(
+            func=ast.Name(id=HELPER, ctx=ast.Load()),
+            args=[ast.Constant(value=kind), ast.Constant(value=data)],
+            keywords=[],
+        )
+        if kind != "m" and type(value) is tuple:
+            call = ast.Call(
+                func=ast.Name(id="tuple", ctx=ast.Load()), args=[call], keywords=[]
+            )
+        return ast.fix_missing_locations(ast.copy_location(call, node))
+
+
+def rewrite(root, threshold):
+    """Pack the constant tables of ``root`` of at least ``threshold`` bytes."""
+    packer = Packer(threshold)
+    packer.visit(root)
+    if packer.packed:
+        utils.insert_helper(root, ast.parse(_helper_source).body)
+    return packer.packed
@@ -0,0 +1,134 @@
+"""Transform and unparse the top-level statements of a module in parallel.
+
+Once ``Preprocess`` has fixed the mapping, top-level statements can be
+obfuscated independently. Each statement is seeded from the run's seed and its
+index, so the output does not depend on the number of workers.
+
+With a ``cache``, statements are instead seeded from a hash of their content
+and of the renamings that apply to them. Unchanged statements then produce the
+same text, which is reused from the cache instead of being obfuscated again.
+
+Workers read the renamings from a shared ``table.Table``.
+"""
+
+import ast
+import concurrent.futures
+import copy
+import hashlib
+import os
+import random
+
+from bombast import emit, pool, sourcemap, table
+
+_state = None
+
+
+def _init(bombast, iters, with_map, minify):
+    global _state
+    _state = (bombast, iters, with_map, minify)
+
+
+def _run(task, state=None):
+    seed, stmt = task
+    bombast, iters, with_map, minify = state or _state
+    bombast = copy.copy(bombast)
+    bombast.rng = random.Random(seed)
+    root = ast.Module(body=[stmt], type_ignores=[])
+    root = bombast.transform(root, iters)
+    smap = sourcemap.SourceMap() if with_map else None
+    text = emit.unparse(root, smap, minify)
+    # Segments are relative to the statement so they stay valid if it moves.
+    offset = stmt.lineno - 1
+    segments = (
+        []
+        if smap is None
+        else [
+            [line, column, source, source_line - offset, source_column]
+            for line, column, source, source_line, source_column in smap.segments
+        ]
+    )
+    return text, segments
+
+
+def unit_key(stmt, bombast, seed, iters, minify, with_map):
+    """Return a hash of everything the obfuscated text of ``stmt`` depends on."""
+    names = set()
+    for node in ast.walk(stmt):
+        for _, value in ast.iter_fields(node):
+            if isinstance(value, str):
+                names.add(value)
+    mapping = sorted((n, bombast.mapping[n]) for n in names if n in bombast.mapping)
+    imports = sorted(names & bombast.imports)
+    strengths = sorted(
+        (node.lineno, bombast.strengths[node.lineno])
+        for node in ast.walk(stmt)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+        and node.lineno in bombast.strengths
+    )
+    pooled = []
+    if bombast.constants:
+        for node in ast.walk(stmt):
+            if isinstance(node, ast.Constant):
+                pooled.append(bombast.constants.get(pool.key(node.value)))
+    options = (seed, iters, minify, with_map, bombast.elide, bombast.lazy_functions)
+    data = repr((options, ast.dump(stmt), mapping, imports, strengths, pooled))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def obfuscate(
+    root, bombast, seed, iters, jobs, stream, smap=None, minify=False, cache=None
+):
+    """Write the obfuscated source of ``root`` to ``stream``, one shard per
+    statement.
+
+    ``jobs`` is the number of worker processes; 0 uses every core. If ``smap``
+    is given, the segments of each shard are added to it. If ``cache`` is a
+    dict, it is used and then updated to hold exactly the current statements.
+    """
+    if cache is None:
+        seeds = [f"{seed}:{index}" for index in range(len(root.body))]
+        results = {}
+    else:
+        seeds = [
+            unit_key(stmt, bombast, seed, iters, minify, smap is not None)
+            for stmt in root.body
+        ]
+        results = {key: cache[key] for key in seeds if key in cache}
+        cache.clear()
+    tasks = [t for t in zip(seeds, root.body) if t[0] not in results]
+
+    initargs = (bombast, iters, smap is not None, minify)
+    if jobs == 1 or len(tasks) <= 1:
+        shards = (_run(task, initargs) for task in tasks)
+        results.update(zip((t[0] for t in tasks), shards))
+    else:
+        jobs = jobs or os.cpu_count()
+        chunksize = max(1, len(tasks) // (4 * jobs))
+        # Workers share one copy of the renamings instead of each unpickling
+        # or touching its own.
+        names = table.Table.build(bombast.mapping)
+        shared = copy.copy(bombast)
+        shared.mapping = names
+        initargs = (shared,) + initargs[1:]
+        try:
+            with concurrent.futures.ProcessPoolExecutor(
+                jobs, initializer=_init, initargs=initargs
+            ) as executor:
+                shards = executor.map(_run, tasks, chunksize=chunksize)
+                results.update(zip((t[0] for t in tasks), shards))
+        finally:
+            names.unlink()
+
+    line = 0
+    for index, (key, stmt) in enumerate(zip(seeds, root.body)):
+        text, segments = results[key]
+        if cache is not None:
+            cache[key] = results[key]
+        if index:
+            stream.write("\n")
+        stream.write(text)
+        if smap is not None:
+            offset = stmt.lineno - 1
+            for gen_line, column, source, source_line, source_column in segments:
+                smap.add(line + gen_line, column, source_line + offset, source_column)
+            line += text.count("\n") + 1
@@ -0,0 +1,95 @@
+"""Choose how strongly to obfuscate each function from a profile.
+
+A profile is either cProfile/pstats output (``python -m cProfile -o FILE``) or
+collapsed stacks from a sampling profiler, one ``frame;frame;... count`` line
+per stack with frames like ``name (file.py:12)`` (``py-spy record -f raw``).
+Each function's share of the self time decides its strength:
+
+* hot functions only get rewrites the compiler folds back into constants,
+  such as ``1 + 2``, so they run as fast as the original;
+* warm functions get one full iteration, then only those rewrites;
+* cold functions, and code that was never profiled, get every iteration.
+"""
+
+import ast
+import collections
+import marshal
+import os
+import pstats
+import re
+
+_frame = re.compile(r"(?P<name>.*) \((?P<file>.*):(?P<line>\d+)\)$")
+
+
+def load(path):
+    """Return a mapping from ``(file, line, name)`` to self time in ``path``.
+
+    Times are seconds for pstats and sample counts for collapsed stacks.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        is_pstats = isinstance(marshal.loads(data), dict)
+    except (EOFError, ValueError, TypeError):
+        is_pstats = False
+    if not is_pstats:
+        return _load_collapsed(data.decode())
+    stats = pstats.Stats(path).stats
+    return {key: tottime for key, (_, _, tottime, _, _) in stats.items()}
+
+
+def _load_collapsed(text):
+    times = collections.Counter()
+    for line in text.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if not stack or not count.isdigit():
+            continue
+        match = _frame.match(stack.rsplit(";", 1)[-1])
+        if match is not None:
+            key = (match["file"], int(match["line"]), match["name"])
+            times[key] += int(count)
+    return times
+
+
+def functions(root):
+    """Return ``(start, end, node)`` for every function, decorators included."""
+    spans = []
+    for node in ast.walk(root):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            spans.append((start, node.end_lineno, node))
+    return spans
+
+
+def strengths(root, filename, profile, iters, hot=0.01):
+    """Return the number of full iterations for each profiled function in
+    ``root``, keyed by the line of its ``def``, and a report of the choices.
+
+    Entries of ``profile`` are matched to ``filename`` by base name and to the
+    innermost function containing their line. A function is hot from the
+    share ``hot`` of the total self time, and warm from a tenth of that.
+    """
+    basename = os.path.basename(filename)
+    total = sum(profile.values())
+    spans = functions(root)
+    times = collections.Counter()
+    for (file, line, _), time in profile.items():
+        if os.path.basename(file) != basename:
+            continue
+        containing = [span for span in spans if span[0] <= line <= span[1]]
+        if containing:
+            times[max(containing, key=lambda span: span[0])[2]] += time
+
+    result = {}
+    report = []
+    for node, time in times.most_common():
+        share = time / total if total else 0
+        if share >= hot:
+            result[node.lineno], strength = 0, "hot: folded rewrites only"
+        elif share >= hot / 10:
+            result[node.lineno] = min(1, iters)
+            strength = "warm: 1 full iteration"
+        else:
+            result[node.lineno], strength = iters, "cold: full"
+        report.append(f"{node.name:30} line {node.lineno:<6} {share:7.2%}  {strength}")
+    return result, report
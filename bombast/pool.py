@@ -0,0 +1,140 @@
+"""Move the constants of a module into one encoded, lazily decoded table.
+
+Each distinct string, bytes, int and float constant is stored once, in a
+shuffled order, in a base85 blob XOR'd with a random key. ``Bombast`` replaces
+constants with calls like ``_bombast_pool(7)`` that decode an entry on first use
+and memoize it; later iterations leave these calls alone. The helper and its
+table are added to the module before ``Preprocess`` runs, so they are
+obfuscated like the rest of the program.
+"""
+
+import ast
+import base64
+
+from bombast import utils
+
+HELPER = "_bombast_pool"
+
+_helper_source = f"""
+{HELPER}_data = None
+{HELPER}_offsets = None
+{HELPER}_key = None
+{HELPER}_cache = {{}}
+
+
+def {HELPER}(index):
+    global {HELPER}_data, {HELPER}_offsets
+    try:
+        return {HELPER}_cache[index]
+    except KeyError:
+        pass
+    if isinstance({HELPER}_data, str):
+        # getattr, since attributes would be renamed like any other name
+        unpack = getattr(__import__("base64"), "b85decode")
+        {HELPER}_data = unpack({HELPER}_data)
+        offsets = unpack({HELPER}_offsets)
+        from_bytes = getattr(int, "from_bytes")
+        {HELPER}_offsets = [
+            from_bytes(offsets[i : i + 4], "little")
+            for i in range(0, len(offsets), 4)
+        ]
+    start, end = {HELPER}_offsets[index - 1], {HELPER}_offsets[index]
+    key = {HELPER}_key
+    raw = bytes(
+        byte ^ key[(start + i) % len(key)]
+        for i, byte in enumerate({HELPER}_data[start:end])
+    )
+    kind, raw = raw[:1], raw[1:]
+    if kind == b"s":
+        value = getattr(raw, "decode")("utf-8", "surrogatepass")
+    elif kind == b"b":
+        value = raw
+    elif kind == b"i":
+        value = int(raw)
+    else:
+        value = float(raw)
+    {HELPER}_cache[index] = value
+    return value
+"""
+
+_kinds = {str: b"s", bytes: b"b", int: b"i", float: b"f"}
+
+
+def key(value):
+    """Return the pool key of ``value``, or None if it is not pooled."""
+    kind = type(value)
+    if kind not in _kinds:
+        return None
+    return kind, repr(value)  # repr tells 0.0 and -0.0 apart
+
+
+def exclude(nodes):
+    """Keep the constants of the module-level statements ``nodes`` out of the
+    pool, e.g. those of helpers that run before it is defined."""
+    for node in nodes:
+        node._unpooled = True
+
+
+def is_excluded(node):
+    return node.__dict__.get("_unpooled", False)
+
+
+def _encode(value):
+    kind = type(value)
+    if kind is str:
+        data = value.encode("utf-8", "surrogatepass")
+    elif kind is bytes:
+        data = value
+    else:
+        data = repr(value).encode()
+    return _kinds[kind] + data
+
+
+def _constants(root):
+    for node in ast.walk(root):
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+            continue  # docstrings are replaced, not pooled
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.Constant):
+                yield child.value
+
+
+def add_helper(root, rng):
+    """Add the pool of the constants in ``root`` to it and return its index.
+
+    The order of the entries and the key are drawn from the ``random.Random``
+    ``rng``.
+
+    The index maps the ``key`` of each pooled value to its position.
+    """
+    values = {}
+    for value in _constants(root):
+        k = key(value)
+        if k is not None:
+            values.setdefault(k, value)
+    if not values:
+        return {}
+    keys = list(values)
+    rng.shuffle(keys)
+
+    secret = bytes(rng.randrange(256) for _ in range(16))
+    data = bytearray()
+    offsets = [0]
+    for k in keys:
+        for byte in _encode(values[k]):
+            data.append(byte ^ secret[len(data) % len(secret)])
+        offsets.append(len(data))
+
+    helper = ast.parse(_helper_source).body
+    offsets = b"".join(offset.to_bytes(4, "little") for offset in offsets)
+    table = {
+        f"{HELPER}_data": base64.b85encode(bytes(data)).decode(),
+        f"{HELPER}_offsets": base64.b85encode(offsets).decode(),
+        f"{HELPER}_key": secret,
+    }
+    exclude(helper)
+    for node in helper:
+        if isinstance(node, ast.Assign) and node.targets[0].id in table:
+            node.value = ast.parse(repr(table[node.targets[0].id]), mode="eval").body
+    utils.insert_helper(root, helper)
+    return {k: index for index, k in enumerate(keys, 1)}
@@ -0,0 +1,158 @@
+"""Predict how long files take to obfuscate, so batch runs start the longest.
+
+A file's cost is modeled as a linear function of its AST nodes and constants
+times ``--iters``, and of its size in bytes. The coefficients are refit with
+least squares to the timings of earlier runs, kept in ``timings.json`` in the
+cache directory along with each file's features and its last predicted and
+actual time. A file whose features have not changed since it was timed is
+predicted to take as long as it did then.
+
+Files are dispatched longest first. With ``--split NODES``, files of at least
+that many nodes are also obfuscated in statement shards by several processes,
+as with ``--jobs``; which files are split depends only on their size, so their
+output does not change with the timings.
+"""
+
+import ast
+import json
+import math
+import os
+
+from bombast import utils
+
+FEATURES = ("nodes", "constants", "bytes", "base")
+
+# Seconds per unit of each feature on a typical machine, until there are
+# enough timings to fit.
+DEFAULTS = (8e-6, 2e-5, 5e-7, 0.01)
+
+RIDGE = 1e-9
+
+
+def timings_path(cache_dir=None):
+    return os.path.join(cache_dir or utils.cache_dir(), "timings.json")
+
+
+def describe(path, iters, known=None):
+    """Return the features of the file ``path`` obfuscated with ``iters``.
+
+    A ``known`` entry for the same file is reused if it is unchanged.
+    """
+    stat = os.stat(path)
+    entry = {"mtime": stat.st_mtime, "size": stat.st_size}
+    if known and all(known.get(k) == v for k, v in entry.items()):
+        entry.update(nodes=known["nodes"], constants=known["constants"])
+    else:
+        with open(path, "rb") as f:
+            try:
+                root = ast.parse(f.read())
+            except (SyntaxError, ValueError):
+                root = None
+        nodes = constants = 0
+        if root is not None:
+            for node in ast.walk(root):
+                nodes += 1
+                constants += isinstance(node, ast.Constant)
+        entry.update(nodes=nodes, constants=constants)
+    entry["iters"] = iters
+    return entry
+
+
+def vector(entry):
+    """Return the values of ``FEATURES`` for a file described by ``entry``."""
+    work = max(entry["iters"], 1)
+    return (work * entry["nodes"], work * entry["constants"], entry["size"], 1)
+
+
+def solve(matrix, values):
+    """Solve the square linear system ``matrix @ x = values``."""
+    n = len(values)
+    rows = [list(row) + [value] for row, value in zip(matrix, values)]
+    for i in range(n):
+        pivot = max(range(i, n), key=lambda r: abs(rows[r][i]))
+        rows[i], rows[pivot] = rows[pivot], rows[i]
+        if rows[i][i] == 0:
+            raise ValueError("singular matrix")
+        for r in range(n):
+            if r != i:
+                factor = rows[r][i] / rows[i][i]
+                rows[r] = [a - factor * b for a, b in zip(rows[r], rows[i])]
+    return [rows[i][n] / rows[i][i] for i in range(n)]
+
+
+class Model(object):
+    def __init__(self, history=None):
+        self.history = history or {}
+        self.coefficients = DEFAULTS
+        samples = [e for e in self.history.values() if e.get("actual")]
+        if len(samples) >= 2 * len(FEATURES):
+            self.fit(samples)
+
+    def fit(self, samples):
+        """Fit non-negative coefficients to the actual times of ``samples``."""
+        n = len(FEATURES)
+        # Scale the features so the ridge term treats them alike.
+        scale = [max(abs(vector(s)[j]) for s in samples) or 1 for j in range(n)]
+        rows = [[v / s for v, s in zip(vector(sample), scale)] for sample in samples]
+        used = list(range(n))
+        while used:
+            xtx = [[RIDGE * (i == j) for j in used] for i in used]
+            xty = [0] * len(used)
+            for x, sample in zip(rows, samples):
+                for a, i in enumerate(used):
+                    xty[a] += x[i] * sample["actual"]
+                    for b, j in enumerate(used):
+                        xtx[a][b] += x[i] * x[j]
+            try:
+                fitted = solve(xtx, xty)
+            except ValueError:
+                return
+            if min(fitted) >= 0:
+                break
+            # Correlated features can get negative weights; drop the worst.
+            del used[fitted.index(min(fitted))]
+        if not used:
+            return
+        coefficients = [0] * n
+        for i, c in zip(used, fitted):
+            coefficients[i] = c / scale[i]
+        self.coefficients = tuple(coefficients)
+
+    def predict(self, path, entry):
+        """Return the predicted seconds to obfuscate ``path``."""
+        known = self.history.get(path)
+        if (
+            known
+            and known.get("actual")
+            and all(
+                known.get(k) == entry[k]
+                for k in ("size", "nodes", "constants", "iters")
+            )
+        ):
+            return known["actual"]
+        cost = sum(c * x for c, x in zip(self.coefficients, vector(entry)))
+        return max(cost, 0.001)
+
+
+def plan(tasks, entries, workers, split=0):
+    """Return ``tasks`` longest first, sharding those with ``split`` nodes.
+
+    ``entries`` describe each task's file, with its ``predicted`` seconds.
+    """
+    share = sum(e["predicted"] for e in entries.values()) / max(workers, 1)
+    planned = []
+    for task in sorted(tasks, key=lambda t: -entries[t.path]["predicted"]):
+        entry = entries[task.path]
+        if split and entry["nodes"] >= split:
+            jobs = math.ceil(entry["predicted"] / share) if share else 1
+            task = task._replace(jobs=min(max(jobs, 1), workers))
+        planned.append(task)
+    return planned
+
+
+def load(cache_dir=None):
+    return utils.load_json(timings_path(cache_dir), {})
+
+
+def save(history, cache_dir=None):
+    utils.write_atomic(timings_path(cache_dir), json.dumps(history))
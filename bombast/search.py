@@ -0,0 +1,273 @@
+"""Obfuscate a file with several seeds in parallel and keep the best output.
+
+Usage: bombast search [options] INFILE OUTFILE
+
+Candidate ``k`` is the output of ``bombast --seed SEED+k`` with the same
+options, so candidate 0 is what ``bombast`` itself would produce, and the
+winning seed rebuilds the winner. The file is parsed and its identifiers are
+found once, and each candidate renames them with its own seed, as in ``bombast
+variants``; the candidates are transformed and scored in parallel. With
+``--constant-pool``, whose table is shuffled with the seed before the names are
+drawn, each candidate is analyzed in turn instead.
+
+Candidates are scored on a weighted sum of metrics, each divided by its best
+value among the candidates; the lowest score wins:
+
+* ``bytes``: size of the output;
+* ``bytecode``: size of the bytecode of every code object in the output;
+* ``depth``: nesting depth of the output's syntax tree;
+* ``runtime``: best wall-clock time of ``--workload`` over ``--repeat`` runs;
+  use ``--workers 1`` for measurements that do not compete for cores.
+
+Candidates that fail to compile or make the workload fail are discarded. The
+scores and the winning seed are written to ``OUTFILE.search.json``.
+"""
+
+import argparse
+import ast
+import concurrent.futures
+import copy
+import io
+import json
+import os
+import pickle
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+import bombast
+from bombast import emit, sourcemap
+
+METRICS = ("bytes", "bytecode", "depth", "runtime")
+
+_state = None
+
+
+def parse_score(spec):
+    """Parse ``"bytes=1,runtime=2"`` into weights; a bare name weighs 1."""
+    weights = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        if name not in METRICS:
+            raise argparse.ArgumentTypeError(f"unknown metric {name!r}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def bytecode_size(code):
+    """Return the total size of ``code`` and the code objects nested in it."""
+    size = 0
+    stack = [code]
+    while stack:
+        code = stack.pop()
+        size += len(code.co_code)
+        stack.extend(c for c in code.co_consts if hasattr(c, "co_code"))
+    return size
+
+
+def depth(root):
+    """Return the nesting depth of the tree ``root``."""
+    deepest = 0
+    stack = [(root, 1)]
+    while stack:
+        node, level = stack.pop()
+        deepest = max(deepest, level)
+        stack.extend((child, level + 1) for child in ast.iter_child_nodes(node))
+    return deepest
+
+
+def runtime(text, name, workload, repeat, timeout):
+    """Return the best time of ``workload`` with the candidate as ``name``.
+
+    ``{}`` in ``workload`` is replaced by the path of the candidate, whose
+    directory is also the working directory and first on ``PYTHONPATH``.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write(text)
+        command = [arg.replace("{}", path) for arg in shlex.split(workload)]
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [directory, env.get("PYTHONPATH")])
+        )
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(
+                command,
+                cwd=directory,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout,
+                check=True,
+            )
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+
+def _init(options):
+    global _state
+    _state = options
+
+
+def _run(task, options=None):
+    index, seed, tree = task
+    options = options or _state
+    root, preprocess, obfuscator = pickle.loads(tree)
+    if options.shared:
+        variant = preprocess.variant(root, seed, options.naming == "compact-shuffled")
+        obfuscator = obfuscator.variant(variant)
+    root = bombast.finish(root, obfuscator, options)
+    smap = None
+    if options.source_map:
+        smap = sourcemap.SourceMap(options.outfile, [options.infile])
+    text = emit.unparse(root, smap, options.minify) + "\n"
+
+    result = {"candidate": index, "seed": seed}
+    try:
+        code = compile(text, options.outfile, "exec")
+        result["bytes"] = len(text.encode())
+        result["bytecode"] = bytecode_size(code)
+        result["depth"] = depth(root)
+        if "runtime" in options.score:
+            result["runtime"] = runtime(
+                text,
+                os.path.basename(options.outfile),
+                options.workload,
+                options.repeat,
+                options.timeout,
+            )
+    except (SyntaxError, subprocess.SubprocessError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    smap = None if smap is None else smap.dumps()
+    return result, text, smap, obfuscator.mapping
+
+
+def score(results, weights):
+    """Set the ``score`` of each valid result; lower is better."""
+    valid = [r for r in results if "error" not in r]
+    for metric, weight in weights.items():
+        best = min(r[metric] for r in valid) or 1
+        for r in valid:
+            r["score"] = r.get("score", 0) + weight * r[metric] / best
+
+
+def search(args, config=None):
+    """Write the best of ``args.candidates`` candidates to ``args.outfile``."""
+    source = args.infile.read()
+    args.infile.close()
+    shared = not args.constant_pool
+    tasks = []
+    for k in range(args.candidates):
+        seed = args.seed + k
+        if k == 0 or not shared:
+            candidate = copy.copy(args)
+            candidate.seed = seed
+            candidate.infile = io.BytesIO(source)
+            candidate.infile.name = args.infile.name
+            tree = pickle.dumps(bombast.analyze(candidate, config))
+        tasks.append((k, seed, tree))
+    outfile = args.outfile.name
+    args.outfile.close()
+    options = argparse.Namespace(
+        iters=args.iters,
+        minify=args.minify,
+        naming=args.naming,
+        shared=shared,
+        source_map=args.source_map,
+        infile=args.infile.name,
+        outfile=outfile,
+        score=args.score,
+        workload=args.workload.replace("{python}", shlex.quote(sys.executable)),
+        repeat=args.repeat,
+        timeout=args.timeout,
+    )
+
+    if args.workers == 1:
+        candidates = [_run(task, options) for task in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            args.workers or None, initializer=_init, initargs=(options,)
+        ) as executor:
+            candidates = list(executor.map(_run, tasks))
+
+    results = [result for result, _, _, _ in candidates]
+    if all("error" in r for r in results):
+        for r in results:
+            print(f"candidate {r['candidate']}: {r['error']}", file=sys.stderr)
+        sys.exit(1)
+    score(results, args.score)
+    winner = min(
+        (c for c in candidates if "error" not in c[0]), key=lambda c: c[0]["score"]
+    )
+    result, text, smap, mapping = winner
+
+    with open(outfile, "w") as f:
+        f.write(text)
+    if smap is not None:
+        with open(outfile + ".map", "w") as f:
+            f.write(smap)
+    with open(outfile + ".search.json", "w") as f:
+        report = {"winner": result["candidate"], "seed": result["seed"]}
+        json.dump(dict(report, candidates=results), f, indent=2)
+    print(
+        f"candidate {result['candidate']} (seed {result['seed']}) won with "
+        + ", ".join(f"{m}={result[m]:g}" for m in METRICS if m in result),
+        file=sys.stderr,
+    )
+    if args.show_translations:
+        for original, obfuscated in mapping.items():
+            print(original, "=", obfuscated)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="bombast search",
+        description="Obfuscate with several seeds and keep the best output.",
+    )
+    parser.add_argument("infile", type=argparse.FileType("rb"), help="input")
+    parser.add_argument("outfile", type=argparse.FileType("w"), help="output")
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=8,
+        help="number of seeds to try [default: 8]",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="worker processes, 0 for all cores [default: 0]",
+    )
+    parser.add_argument(
+        "--score",
+        type=parse_score,
+        default={"bytes": 1.0},
+        help="weighted metrics to minimize, from "
+        + ", ".join(METRICS)
+        + " [default: bytes]",
+    )
+    parser.add_argument(
+        "--workload",
+        default="{python} {}",
+        help="command timed by the runtime metric; {} is the candidate's path "
+        "and {python} this interpreter [default: run the candidate]",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="runs of the workload per candidate [default: 3]",
+    )
+    parser.add_argument(
+        "--timeout", type=float, help="seconds allowed per workload run"
+    )
+    bombast.add_arguments(parser)
+    args = parser.parse_args(argv)
+    bombast.reject(parser, args, ["--jobs", "--incremental"])
+    search(args, bombast.configure(args.config))
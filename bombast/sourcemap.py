@@ -0,0 +1,148 @@
+"""Source maps from obfuscated line/column back to original file/line.
+
+Maps are written in the Source Map Revision 3 format (the ``.map`` files used
+by JavaScript tooling): a JSON object whose ``mappings`` field is a list of
+base64 VLQ encoded segments, one group per generated line. Only statements are
+mapped, so a traceback line in obfuscated code resolves to the original
+statement that produced it. Segments are recorded by ``emit.Emitter``.
+
+Lines and columns are 0-based inside the map, as the format requires.
+``SourceMap.lookup`` takes the 1-based line numbers printed in tracebacks, and
+``bombast sourcemap MAP LINE...`` looks them up from the command line.
+"""
+
+import argparse
+import bisect
+import json
+
+_b64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+_b64_index = {c: i for i, c in enumerate(_b64)}
+
+
+def vlq_encode(value):
+    value = (-value << 1) | 1 if value < 0 else value << 1
+    chunks = []
+    while True:
+        digit, value = value & 31, value >> 5
+        if value:
+            digit |= 32
+        chunks.append(_b64[digit])
+        if not value:
+            return "".join(chunks)
+
+
+def vlq_decode(segment):
+    values, value, shift = [], 0, 0
+    for c in segment:
+        digit = _b64_index[c]
+        value += (digit & 31) << shift
+        if digit & 32:
+            shift += 5
+        else:
+            values.append(-(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    return values
+
+
+class SourceMap(object):
+    """Segments mapping generated positions to original positions."""
+
+    def __init__(self, file=None, sources=()):
+        self.file = file
+        self.sources = list(sources)
+        self.segments = []  # (line, column, source, source_line, source_column)
+
+    def add(self, line, column, source_line, source_column, source=0):
+        self.segments.append((line, column, source, source_line, source_column))
+
+    def extend(self, other, line_offset=0):
+        """Append the segments of ``other``, shifted down by ``line_offset``."""
+        for line, column, source, source_line, source_column in other.segments:
+            self.add(line + line_offset, column, source_line, source_column, source)
+
+    def encode(self):
+        groups, previous = [], (0, 0, 0)
+        segments = sorted(self.segments)
+        i = 0
+        for line in range(segments[-1][0] + 1 if segments else 0):
+            group, column = [], 0
+            while i < len(segments) and segments[i][0] == line:
+                _, col, source, source_line, source_column = segments[i]
+                current = (source, source_line, source_column)
+                fields = [col - column] + [a - b for a, b in zip(current, previous)]
+                group.append("".join(vlq_encode(f) for f in fields))
+                column, previous = col, current
+                i += 1
+            groups.append(",".join(group))
+        return ";".join(groups)
+
+    def dumps(self):
+        return json.dumps(
+            {
+                "version": 3,
+                "file": self.file,
+                "sources": self.sources,
+                "names": [],
+                "mappings": self.encode(),
+            },
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def loads(cls, text):
+        data = json.loads(text)
+        sourcemap = cls(data.get("file"), data["sources"])
+        source = source_line = source_column = 0
+        for line, group in enumerate(data["mappings"].split(";")):
+            column = 0
+            for segment in filter(None, group.split(",")):
+                fields = vlq_decode(segment)
+                column += fields[0]
+                if len(fields) < 4:
+                    continue
+                source += fields[1]
+                source_line += fields[2]
+                source_column += fields[3]
+                sourcemap.add(line, column, source_line, source_column, source)
+        return sourcemap
+
+    def lookup(self, line, column=None):
+        """Return (source, line, column) for a 1-based obfuscated line.
+
+        The result is the closest mapped statement at or before the position,
+        with a 1-based original line, or None if nothing precedes it. Without
+        a ``column``, it is the first statement on the line, which is the one
+        a traceback points at; statements start at their indentation.
+        """
+        if not hasattr(self, "_keys"):
+            self.segments.sort()
+            self._keys = [(s[0], s[1]) for s in self.segments]
+        if column is None:
+            # A line without statements continues the one before it.
+            i = bisect.bisect_left(self._keys, (line - 1,))
+            if i == len(self._keys) or self._keys[i][0] != line - 1:
+                i -= 1
+        else:
+            i = bisect.bisect_right(self._keys, (line - 1, column)) - 1
+        if i < 0:
+            return None
+        _, _, source, source_line, source_column = self.segments[i]
+        return self.sources[source], source_line + 1, source_column
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="bombast sourcemap",
+        description="Map obfuscated line numbers back to the original source.",
+    )
+    parser.add_argument("map", type=argparse.FileType("r"), help="source map")
+    parser.add_argument("lines", type=int, nargs="+", help="obfuscated line numbers")
+    args = parser.parse_args(argv)
+    sourcemap = SourceMap.loads(args.map.read())
+    args.map.close()
+    for line in args.lines:
+        location = sourcemap.lookup(line)
+        if location is None:
+            print(f"{line}: unmapped")
+        else:
+            print(f"{line}: {location[0]}:{location[1]}")
@@ -0,0 +1,127 @@
+"""An immutable rename table that worker processes share instead of copying.
+
+The table is a file of UTF-8 strings, an array of their offsets, and an open
+addressing hash table of CRC-32s, mapped into memory with ``mmap``. Pickling a
+``Table`` only pickles its path, and every process that opens it maps the same
+pages, so memory use does not grow with the number of workers. Each process
+memoizes the names it looks up, so repeated lookups cost a dict lookup.
+"""
+
+import array
+import collections.abc
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+
+MAGIC = b"BMRT"
+_header = struct.Struct("=4sII")  # magic, entries, slots
+
+
+def _directory():
+    # /dev/shm keeps the table out of the page cache of a real disk.
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def _encode(text):
+    return text.encode("utf-8", "surrogatepass")
+
+
+class Table(collections.abc.Mapping):
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, slots = _header.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a rename table")
+        view = memoryview(self.buffer)
+        start = _header.size
+        self.slots = view[start : start + 4 * slots].cast("I")
+        start += 4 * slots
+        self.offsets = view[start : start + 4 * (2 * self.size + 1)].cast("I")
+        self.strings = start + 4 * (2 * self.size + 1)
+        self.mask = slots - 1
+        self.cache = {}
+
+    @classmethod
+    def build(cls, mapping, directory=None):
+        """Write ``mapping`` to a new table file and open it."""
+        strings = bytearray()
+        offsets = [0]
+        for key, value in mapping.items():
+            strings += _encode(key)
+            offsets.append(len(strings))
+            strings += _encode(value)
+            offsets.append(len(strings))
+        slots = 8
+        while slots < 2 * len(mapping):
+            slots *= 2
+        table = array.array("I", bytes(4 * slots))
+        for index, key in enumerate(mapping):
+            slot = zlib.crc32(_encode(key)) & (slots - 1)
+            while table[slot]:
+                slot = (slot + 1) & (slots - 1)
+            table[slot] = index + 1
+
+        fd, path = tempfile.mkstemp(".names", "bombast-", directory or _directory())
+        with os.fdopen(fd, "wb") as f:
+            f.write(_header.pack(MAGIC, len(mapping), slots))
+            f.write(table.tobytes())
+            f.write(array.array("I", offsets).tobytes())
+            f.write(strings)
+        return cls(path)
+
+    def _string(self, i):
+        start = self.strings + self.offsets[i]
+        end = self.strings + self.offsets[i + 1]
+        return self.buffer[start:end].decode("utf-8", "surrogatepass")
+
+    def _find(self, key):
+        if not isinstance(key, str):
+            return None  # like a dict of strings, e.g. for a missing asname
+        data = _encode(key)
+        slot = zlib.crc32(data) & self.mask
+        while True:
+            index = self.slots[slot]
+            if not index:
+                return None
+            i = 2 * (index - 1)
+            start = self.strings + self.offsets[i]
+            if self.buffer[start : self.strings + self.offsets[i + 1]] == data:
+                return self._string(i + 1)
+            slot = (slot + 1) & self.mask
+
+    def get(self, key, default=None):
+        try:
+            value = self.cache[key]
+        except KeyError:
+            value = self.cache[key] = self._find(key)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self._string(2 * i)
+
+    def __len__(self):
+        return self.size
+
+    def __reduce__(self):
+        return type(self), (self.path,)
+
+    def unlink(self):
+        """Remove the file; processes that opened the table can still use it."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
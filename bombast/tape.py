@@ -0,0 +1,174 @@
+"""Record the random decisions of a run, and replay them without the RNG.
+
+A tape is a ``random.Random`` that keeps every decision it makes: each index
+drawn by ``choice``, ``randrange`` or ``shuffle``, and each float drawn by
+``random``. Decisions are kept by the path of the node they were made for,
+which ``Bombast.path`` gives as the iteration and the source position of the
+node being transformed; those made while the file is analyzed, such as the new
+names, have the empty path.
+
+``bombast --record-tape FILE`` writes the decisions of a run to FILE, and
+``bombast --replay-tape FILE`` makes the same decisions again in the same
+order, so it reproduces the output exactly whatever the seed. Replay fails if
+the input is not the one that was recorded, or if the run asks for a decision
+the tape does not have, e.g. because it was given other options.
+
+A tape file is ``MAGIC`` followed by a zlib stream of the SHA-256 of the input,
+then for each path its length, its numbers, the number of its decisions and the
+decisions, all as LEB128 varints. Floats are stored as the 53-bit integers they
+are made from.
+"""
+
+import hashlib
+import random
+import zlib
+
+MAGIC = b"BMTP\x01"
+
+_SCALE = 2**53  # random() returns a multiple of 1 / _SCALE
+
+
+class TapeError(Exception):
+    pass
+
+
+def _write(out, value):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Tape(random.Random):
+    """A ``random.Random`` whose decisions are kept by node path.
+
+    ``where`` returns the path of the current decision.
+    """
+
+    def __init__(self, seed=None):
+        super().__init__(seed)
+        self.where = tuple
+        self.digest = None  # SHA-256 of the input
+        self.decisions = {}  # path -> decisions
+
+    def check(self, source):
+        """Note that ``source`` is the input being obfuscated."""
+        self.digest = hashlib.sha256(source).digest()
+
+    def dumps(self):
+        out = bytearray(self.digest or bytes(32))
+        _write(out, len(self.decisions))
+        for path, decisions in self.decisions.items():
+            _write(out, len(path))
+            for number in path:
+                _write(out, number)
+            _write(out, len(decisions))
+            for decision in decisions:
+                _write(out, decision)
+        return MAGIC + zlib.compress(bytes(out), 9)
+
+
+class Recorder(Tape):
+    """A ``Tape`` that draws its decisions from the Mersenne Twister like
+    ``random.Random(seed)``."""
+
+    def _add(self, decision):
+        path = self.where()
+        decisions = self.decisions.get(path)
+        if decisions is None:
+            decisions = self.decisions[path] = []
+        decisions.append(decision)
+
+    def _randbelow(self, n):
+        index = super()._randbelow(n)
+        self._add(index)
+        return index
+
+    def random(self):
+        value = super().random()
+        self._add(int(value * _SCALE))
+        return value
+
+
+class Player(Tape):
+    """A ``Tape`` that makes the decisions of a recorded one, in order."""
+
+    def __init__(self, digest, decisions):
+        super().__init__(0)
+        self.digest = digest
+        self.decisions = decisions
+        self.used = dict.fromkeys(decisions, 0)
+
+    def check(self, source):
+        if hashlib.sha256(source).digest() != self.digest:
+            raise TapeError("the tape was recorded for another input")
+
+    def _next(self, path):
+        decisions = self.decisions.get(path, ())
+        used = self.used.get(path, 0)
+        if used == len(decisions):
+            raise TapeError(f"no decision left at {path}")
+        self.used[path] = used + 1
+        return decisions[used]
+
+    def _randbelow(self, n):
+        path = self.where()
+        index = self._next(path)
+        if index >= n:
+            raise TapeError(f"decision {index} at {path} is out of range({n})")
+        return index
+
+    def random(self):
+        return self._next(self.where()) / _SCALE
+
+    def finish(self):
+        """Check that every decision on the tape was made."""
+        for path, decisions in self.decisions.items():
+            if self.used[path] < len(decisions):
+                raise TapeError(f"decisions at {path} were not made")
+
+
+def loads(data):
+    """Return a ``Player`` of the tape ``data``."""
+    if not data.startswith(MAGIC):
+        raise TapeError("not a decision tape")
+    try:
+        data = zlib.decompress(data[len(MAGIC) :])
+        digest, pos = data[:32], 32
+        decisions = {}
+        count, pos = _read(data, pos)
+        for _ in range(count):
+            length, pos = _read(data, pos)
+            path = []
+            for _ in range(length):
+                number, pos = _read(data, pos)
+                path.append(number)
+            length, pos = _read(data, pos)
+            values = decisions[tuple(path)] = []
+            for _ in range(length):
+                value, pos = _read(data, pos)
+                values.append(value)
+    except (zlib.error, IndexError):
+        raise TapeError("the tape is corrupt")
+    return Player(digest, decisions)
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def save(path, tape):
+    with open(path, "wb") as f:
+        f.write(tape.dumps())
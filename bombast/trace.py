@@ -0,0 +1,161 @@
+"""Record a timeline of the phases of a run, and report the progress of batches.
+
+A process that called ``start`` records each ``span`` as a Chrome trace event,
+which chrome://tracing and Perfetto can open. ``bombast batch --trace FILE``
+collects the events of every worker into FILE, with a track per worker.
+``--progress FD`` writes a JSON object per line to file descriptor FD as files
+start and finish. When neither is given, ``span`` returns a shared no-op
+context, so the phases cost a function call each. Recording is per thread.
+"""
+
+import ast
+import contextlib
+import json
+import os
+import threading
+import time
+
+_local = threading.local()  # events: the spans recorded, or None
+_null = contextlib.nullcontext()
+
+
+def start():
+    """Record the spans of this thread until ``collect`` is called."""
+    _local.events = []
+
+
+def collect():
+    """Return the spans recorded since the last call, if recording."""
+    events = getattr(_local, "events", None)
+    if events is not None:
+        _local.events = []
+    return events
+
+
+def nodes(root):
+    return sum(1 for _ in ast.walk(root))
+
+
+@contextlib.contextmanager
+def _span(events, name, args):
+    begin = time.monotonic_ns()
+    try:
+        yield args
+    finally:
+        end = time.monotonic_ns()
+        events.append(
+            {
+                "name": name,
+                "ph": "X",
+                "ts": begin / 1000,
+                "dur": (end - begin) / 1000,
+                "args": args,
+            }
+        )
+
+
+def span(name, **args):
+    """Return a context that records a span named ``name``.
+
+    It yields the dict of the span's arguments, which can be added to, or None
+    when not recording.
+    """
+    events = getattr(_local, "events", None)
+    if events is None:
+        return _null
+    return _span(events, name, args)
+
+
+class Monitor(object):
+    """Collect the spans of batch workers and report the progress of files."""
+
+    def __init__(self, total, trace_path=None, progress_fd=None):
+        self.total = total
+        self.done = self.failed = 0
+        self.trace_path = trace_path
+        self.events = []
+        self.workers = set()
+        self.started = {}
+        self.stream = None
+        if progress_fd is not None:
+            self.stream = os.fdopen(progress_fd, "w", buffering=1, closefd=False)
+
+    def report(self, event, **fields):
+        if self.stream is not None:
+            record = dict(event=event, time=round(time.time(), 3), **fields)
+            self.stream.write(json.dumps(record) + "\n")
+
+    def start(self, worker, task):
+        self.started[worker] = time.monotonic_ns()
+        self.report(
+            "start",
+            file=task.path,
+            worker=worker,
+            iters=task.iters,
+            attempt=task.attempt,
+        )
+
+    def finish(self, worker, task, error=None, final=True, events=None):
+        """Record that ``worker`` finished ``task``, with the spans it sent.
+
+        A task that failed without ``final`` will be retried.
+        """
+        begin = self.started.pop(worker, None)
+        if events is None and begin is not None:
+            # The worker was lost, so show how long it had the file.
+            now = time.monotonic_ns()
+            args = {"file": task.path, "error": error}
+            events = [
+                {
+                    "name": "file",
+                    "ph": "X",
+                    "ts": begin / 1000,
+                    "dur": (now - begin) / 1000,
+                    "args": args,
+                }
+            ]
+        for event in events or ():
+            event.update(pid=0, tid=worker)
+            self.events.append(event)
+        self.workers.add(worker)
+
+        if error is None:
+            self.done += 1
+            status = "ok"
+        elif final:
+            self.failed += 1
+            status = "failed"
+        else:
+            status = "retry"
+        self.report(
+            "finish",
+            file=task.path,
+            worker=worker,
+            status=status,
+            error=error,
+            done=self.done,
+            failed=self.failed,
+            total=self.total,
+        )
+
+    def close(self):
+        self.report("end", done=self.done, failed=self.failed, total=self.total)
+        if self.stream is not None:
+            self.stream.close()
+        if self.trace_path is None:
+            return
+        names = [
+            {"name": "process_name", "ph": "M", "pid": 0, "args": {"name": "bombast"}}
+        ]
+        for worker in sorted(self.workers):
+            names.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 0,
+                    "tid": worker,
+                    "args": {"name": f"worker {worker}"},
+                }
+            )
+        with open(self.trace_path, "w") as f:
+            json.dump({"traceEvents": names + self.events}, f)
@@ -28,158 +28,188 @@ from ast import With  # withitem
 from ast import FunctionDef, Lambda, arguments, arg, Return, Yield, Global, Nonlocal
 from ast import ClassDef
 
-import random
+from bombast import leaves
 
 
 class Transformation(object):
+    __slots__ = ("fns",)
+
     def __init__(self, *fns):
         self.fns = fns
 
-    def transform(self, input):
+    def transform(self, input, rng, shared):
         if self.fns:
-            return random.choice(self.fns)(input)
+            return rng.choice(self.fns)(input, rng, shared)
         return input
 
 
 class PrimitiveBombast(object):
-    def __init__(self, node):
-        self.node = node
+    """A stateless catalog of ``Transformations`` for one kind of node.
 
-    def transform(self, input):
-        return input
+    Each subclass has a single instance below; ``transform`` takes the node, the
+    ``random.Random`` that makes the choices and the ``leaves.Leaves`` of the
+    run, which the new leaves are shared from.
+    """
+
+    __slots__ = ()
+
+    def transform(self, node, rng, shared):
+        return node
 
 
 class RenameBombast(PrimitiveBombast):
-    def __init__(self, node, bombast):
-        super().__init__(node)
-        self.bombast = bombast
+    __slots__ = ()
 
 
 class StrBombast(PrimitiveBombast):
-    def transform(self):
-        s = self.node.s
-        if len(s) == 0:
-            return self.zero.transform(self.node)
-        elif len(s) == 1:
-            return self.one.transform(self.node)
+    __slots__ = ()
+
+    def transform(self, node, rng, shared):
+        n = len(node.value)
+        if n == 0:
+            return self.zero.transform(node, rng, shared)
+        elif n == 1:
+            return self.one.transform(node, rng, shared)
         else:
-            return self.many.transform(self.node)
+            return self.many.transform(node, rng, shared)
 
-    def zero_Constructor(node):  # '' -> str()
-        return Call(
-            func=Name(id="str", ctx=Load()),
-            args=[],
-            keywords=[],
-            starargs=None,
-            kwargs=None,
-        )
+    def zero_Constructor(node, rng, shared):  # '' -> str()
+        return Call(func=shared.name("str"), args=[], keywords=[])
 
-    def zero_Identity(node):  # '' -> ''
+    def zero_Identity(node, rng, shared):  # '' -> ''
         return node
 
     zero = Transformation(zero_Constructor, zero_Identity)
 
-    def one_Ordinal(node):  # 'a' -> chr(97)
+    def one_Ordinal(node, rng, shared):  # 'a' -> chr(97)
         return Call(
-            func=Name(id="chr", ctx=Load()),
-            args=[Constant(value=ord(node.s))],
+            func=shared.name("chr"),
+            args=[shared.constant(ord(node.value))],
             keywords=[],
-            starargs=None,
-            kwargs=None,
         )
 
-    def one_Identity(node):  # 'a' -> 'a'
+    def one_Identity(node, rng, shared):  # 'a' -> 'a'
         return node
 
     one = Transformation(one_Ordinal, one_Identity)
 
-    def many_Split(node):  # 'hello' -> 'h' + 'ello' (with randomly chosen cut)
-        s = node.s
-        i = random.randrange(len(s))
-        return BinOp(left=Constant(value=s[:i]), right=Constant(value=s[i:]), op=Add())
+    def many_Split(
+        node, rng, shared
+    ):  # 'hello' -> 'h' + 'ello' (with randomly chosen cut)
+        s = node.value
+        i = rng.randrange(len(s))
+        return BinOp(
+            left=shared.constant(s[:i]), right=shared.constant(s[i:]), op=leaves.ADD
+        )
 
     many = Transformation(many_Split)
 
 
 class NumBombast(PrimitiveBombast):
-    def transform(self):
-        n = self.node.n
+    __slots__ = ()
+
+    def transform(self, node, rng, shared):
+        n = node.value
         if not n:
-            return self.zero.transform(self.node)
+            return self.zero.transform(node, rng, shared)
         elif isinstance(n, int):
-            return self.int.transform(self.node)
+            return self.int.transform(node, rng, shared)
         else:
-            return self.float.transform(self.node)
+            return self.float.transform(node, rng, shared)
 
-    def zero_Multiplier(node):  # 0 -> int(n * 0)
+    def zero_Multiplier(node, rng, shared):  # 0 -> int(n * 0)
         return Call(
-            func=Name(id="int", ctx=Load()),
+            func=shared.name("int"),
             args=[
                 BinOp(
-                    left=Constant(value=random.random()),
-                    right=Constant(value=0),
-                    op=Mult(),
+                    left=Constant(value=rng.random()),
+                    right=shared.constant(0),
+                    op=leaves.MULT,
                 )
             ],
             keywords=[],
-            starargs=None,
-            kwargs=None,
         )
 
-    def zero_Identity(node):
+    def zero_Identity(node, rng, shared):
         return node
 
     zero = Transformation(zero_Multiplier, zero_Identity)
 
-    def int_Split(node, range=100):  # n -> (n-s) + (s)
-        s = random.randint(-range, range)
-        return BinOp(left=Constant(value=node.n - s), right=Constant(value=s), op=Add())
+    def int_Split(node, rng, shared, range=100):  # n -> (n-s) + (s)
+        s = rng.randint(-range, range)
+        return BinOp(
+            left=shared.constant(node.value - s),
+            right=shared.constant(s),
+            op=leaves.ADD,
+        )
 
     int = Transformation(int_Split)
 
-    def float_Split(node):  # n -> (n-s) + (s)
-        s = random.random()
-        return BinOp(left=Constant(value=node.n - s), right=Constant(value=s), op=Add())
+    def float_Split(node, rng, shared):  # n -> (n-s) + (s)
+        s = rng.random()
+        return BinOp(
+            left=shared.constant(node.value - s),
+            right=shared.constant(s),
+            op=leaves.ADD,
+        )
 
     float = Transformation(float_Split)
 
 
+class FoldedStrBombast(StrBombast):
+    """Only the rewrites of ``StrBombast`` the compiler folds into constants."""
+
+    __slots__ = ()
+
+    zero = Transformation(StrBombast.zero_Identity)
+    one = Transformation(StrBombast.one_Identity)
+
+
+class FoldedNumBombast(NumBombast):
+    """Only the rewrites of ``NumBombast`` the compiler folds into constants."""
+
+    __slots__ = ()
+
+    zero = Transformation(NumBombast.zero_Identity)
+
+
 class ImportBombast(RenameBombast):
+    __slots__ = ()
+
     # import sys -> sys = __import__('sys', globals(), locals(), [], 0)
     one = Transformation(
-        lambda n: Assign(
+        lambda n, rng, shared: Assign(
             targets=[Name(id=n.names[0].name, ctx=Store())],
             value=Call(
-                func=Name(id="__import__", ctx=Load()),
+                func=shared.name("__import__"),
                 args=[
                     Constant(value=n.names[0].name),
-                    Call(
-                        func=Name(id="globals", ctx=Load()),
-                        args=[],
-                        keywords=[],
-                        starargs=None,
-                        kwargs=None,
-                    ),
-                    Call(
-                        func=Name(id="locals", ctx=Load()),
-                        args=[],
-                        keywords=[],
-                        starargs=None,
-                        kwargs=None,
-                    ),
-                    List(elts=[], ctx=Load()),
-                    Constant(value=0),
+                    Call(func=shared.name("globals"), args=[], keywords=[]),
+                    Call(func=shared.name("locals"), args=[], keywords=[]),
+                    List(elts=[], ctx=leaves.LOAD),
+                    shared.constant(0),
                 ],
                 keywords=[],
-                starargs=None,
-                kwargs=None,
             ),
         )
     )
 
-    def transform(self):
-        num_imports = len(self.node.names)
+    def transform(self, node, rng, shared):
+        num_imports = len(node.names)
         if num_imports == 1:
-            return self.one.transform(self.node)
+            return self.one.transform(node, rng, shared)
         else:
-            return self.node
+            return node
+
+
+strings = StrBombast()
+numbers = NumBombast()
+imports = ImportBombast()
+
+# Transformations for each type of Constant value; bool is deliberately absent.
+constants = {int: numbers, float: numbers, str: strings}
+
+# Transformations with no runtime cost, for hot code.
+folded_strings = FoldedStrBombast()
+folded_numbers = FoldedNumBombast()
+folded_constants = {int: folded_numbers, float: folded_numbers, str: folded_strings}
@@ -1,7 +1,10 @@
+import ast
+import itertools
 import json
-import random
+import os
 import string
 import sys
+import tempfile
 
 _first_char = string.ascii_uppercase + string.ascii_lowercase
 _charset = (
@@ -9,19 +12,88 @@ _charset = (
 )
 
 
-def randident(a, b=None):
+def randident(a, b, rng):
     length = None
     try:
-        length = random.randrange(a, b)
+        length = rng.randrange(a, b)
     except:
         pass
     if length is None or b is None:
         length = a
-    return random.choice(_first_char) + "".join(
-        random.choice(_charset) for _ in range(length - 1)
+    return rng.choice(_first_char) + "".join(
+        rng.choice(_charset) for _ in range(length - 1)
     )
 
 
+def shortidents(reserved=()):
+    """Yield identifiers from shortest to longest, skipping ``reserved``."""
+    rest = string.ascii_letters + string.digits + "_"
+    for length in itertools.count(1):
+        for first in _first_char:
+            for chars in itertools.product(rest, repeat=length - 1):
+                ident = first + "".join(chars)
+                if ident not in reserved:
+                    yield ident
+
+
+def locate(node, source):
+    """Give ``node`` and its descendants without a location that of ``source``.
+
+    Descendants that already have a location were produced by an earlier visit
+    and are not walked again.
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if "lineno" in node._attributes:
+            if getattr(node, "lineno", None) is not None:
+                continue
+            if node.__dict__.get("_shared", False):  # see bombast.leaves
+                continue
+            ast.copy_location(node, source)
+        stack.extend(ast.iter_child_nodes(node))
+
+
+def bound_names(root):
+    """Return the identifiers bound anywhere in ``root``: assigned, deleted,
+    defined, imported, or taken as parameters or by ``except`` and ``match``."""
+    names = set()
+    for node in ast.walk(root):
+        if isinstance(node, ast.Name):
+            if not isinstance(node.ctx, ast.Load):
+                names.add(node.id)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.alias):
+            names.add(node.asname or node.name.split(".")[0])
+        elif isinstance(getattr(node, "name", None), str):  # def, class, except, match
+            names.add(node.name)
+        elif isinstance(getattr(node, "rest", None), str):  # match {**rest}
+            names.add(node.rest)
+    return names
+
+
+def insert_helper(root, helper):
+    """Insert the statements ``helper`` at the top of the module ``root``,
+    after its docstring and ``__future__`` imports, located at line 1.
+    """
+    for node in helper:
+        for child in ast.walk(node):
+            if "lineno" in child._attributes:
+                child.lineno = child.end_lineno = 1
+                child.col_offset = child.end_col_offset = 0
+    position = 0
+    for position, node in enumerate(root.body):
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+            continue
+        if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+            continue
+        break
+    else:
+        position = len(root.body)
+    root.body[position:position] = helper
+
+
 def load_config(path, default="bombast.config"):
     if path is None:
         path = default
@@ -37,4 +109,36 @@ def load_config(path, default="bombast.config"):
     return {}
 
 
+def cache_dir():
+    """Return the directory for bombast's on-disk caches."""
+    if "BOMBAST_CACHE_DIR" in os.environ:
+        return os.environ["BOMBAST_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "bombast")
+
+
+def load_json(path, default=None):
+    """Return the JSON in ``path``, or ``default`` if it is missing or invalid."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_atomic(path, data):
+    """Write ``data`` to ``path`` so readers never see a partial file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # A unique name, since threads of one process may write the same path.
+    fd, tmp = tempfile.mkstemp(".tmp", os.path.basename(path) + ".", directory)
+    try:
+        with os.fdopen(fd, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
 VERSION = sys.version_info
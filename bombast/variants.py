@@ -0,0 +1,116 @@
+"""Build several differently obfuscated copies of a program from one parse.
+
+Usage: bombast variants -o OUTDIR [options] FILE_OR_DIR...
+
+Each file is parsed and its identifiers are found once. Variant ``k`` is then
+renamed and transformed with seed ``SEED + k`` in a pool of worker processes
+and written to ``OUTDIR/variant-k``, along with a ``mapping.json`` of the
+renamings of every file in it, instead of ``--show-translations``;
+``--jobs`` and ``--incremental`` are not supported. The constant pool is shared by
+the variants of a file; without ``--constant-pool``, variant ``k`` is exactly the
+output of ``bombast --seed SEED+k``.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import copy
+import json
+import os
+import pickle
+import sys
+
+import bombast
+from bombast import batch, emit, sourcemap
+
+
+def _run(task):
+    tree, path, relpath, seed, outdir, options = task
+    root, preprocess, template = pickle.loads(tree)
+    variant = preprocess.variant(root, seed, options.naming == "compact-shuffled")
+    obfuscator = template.variant(variant)
+    root = bombast.finish(root, obfuscator, options)
+
+    outfile = os.path.join(outdir, relpath)
+    os.makedirs(os.path.dirname(outfile) or ".", exist_ok=True)
+    smap = sourcemap.SourceMap(outfile, [path]) if options.source_map else None
+    with open(outfile, "w") as f:
+        emit.emit(root, f, smap, options.minify)
+        print(file=f)
+    if smap is not None:
+        with open(outfile + ".map", "w") as f:
+            f.write(smap.dumps())
+    return variant.mapping
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="bombast variants",
+        description="Build several differently obfuscated copies of Python files.",
+    )
+    parser.add_argument("paths", nargs="+", help="files or directories")
+    parser.add_argument("-o", "--outdir", required=True, help="output directory")
+    parser.add_argument(
+        "-n",
+        "--variants",
+        type=int,
+        default=2,
+        help="number of variants [default: 2]",
+    )
+    parser.add_argument(
+        "--root", help="directory that outputs are relative to [default: common path]"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="worker processes [default: all cores]",
+    )
+    bombast.add_arguments(parser)
+    args = parser.parse_args(argv)
+    bombast.reject(parser, args, ["--jobs", "--incremental", "--show-translations"])
+    config = bombast.configure(args.config)
+
+    paths = batch.sources(args.paths, args.root)
+    if not paths:
+        return
+    outdirs = [os.path.join(args.outdir, f"variant-{k}") for k in range(args.variants)]
+    mappings = [{} for _ in outdirs]
+    failures = collections.defaultdict(list)
+
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as executor:
+        futures = {}
+        # Files are analyzed here while the workers build the variants of the
+        # files before them.
+        for path, relpath in paths:
+            options = copy.copy(args)
+            options.infile = open(path, "rb")
+            try:
+                tree = pickle.dumps(bombast.analyze(options, config))
+            except Exception as e:
+                failures[path].append(f"{type(e).__name__}: {e}")
+                continue
+            for k, outdir in enumerate(outdirs):
+                task = (tree, path, relpath, args.seed + k, outdir, args)
+                futures[executor.submit(_run, task)] = (path, relpath, k)
+        for future in concurrent.futures.as_completed(futures):
+            path, relpath, k = futures[future]
+            try:
+                mappings[k][relpath] = future.result()
+            except Exception as e:
+                failures[path].append(f"variant {k}: {type(e).__name__}: {e}")
+
+    for k, outdir in enumerate(outdirs):
+        os.makedirs(outdir, exist_ok=True)
+        with open(os.path.join(outdir, "mapping.json"), "w") as f:
+            files = dict(sorted(mappings[k].items()))
+            json.dump({"seed": args.seed + k, "files": files}, f, indent=2)
+    for path, reasons in failures.items():
+        for reason in reasons:
+            print(f"FAIL {path}: {reason}", file=sys.stderr)
+    print(
+        f"{len(paths) - len(failures)} of {len(paths)} files in "
+        f"{args.variants} variants"
+    )
+    if failures:
+        sys.exit(1)
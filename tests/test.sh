@@ -1,8 +1,39 @@
 set -ex
 
+python3 -m bombast.difftest --seeds 0 --iters 3 --no-minimize tests/*.py
+
+# Each option, then combinations whose helpers and rewrites interact.
+for options in \
+    "--minify" \
+    "--naming compact-shuffled" \
+    "--constant-pool" \
+    "--lazy-imports" \
+    "--lazy-functions zlib" \
+    "--elide" \
+    "--pack-tables 1" \
+    "--jobs 2" \
+    "--constant-pool --lazy-functions marshal" \
+    "--constant-pool --lazy-imports --pack-tables 1 --elide" \
+    "--jobs 2 --constant-pool --lazy-functions zlib --minify"; do
+    python3 -m bombast.difftest --seeds 0 --iters 2 --no-minimize --options="$options" tests/*.py
+done
+
+# A cluster of loopback workers writes what plain runs write.
+out=$(mktemp -d)
+python3 -c 'import bombast; bombast.main()' coordinator --spawn 2 --seed 3 --iters 2 -o "$out" tests/*.py
 for f in tests/*.py; do
-    echo Running $f
-    g=$(mktemp)
-    bombast --seed 0 --iters 3 $f $g
-    diff <(python3 $f) <(python3 $g)
+    python3 -c 'import bombast; bombast.main()' --seed 3 --iters 2 "$f" "$out/plain.py"
+    cmp "$out/plain.py" "$out/$(basename "$f")"
+done
+rm -r "$out"
+
+# Replaying a tape reproduces the recorded run, whatever the seed.
+out=$(mktemp -d)
+for options in "--iters 3" "--naming compact-shuffled --constant-pool --lazy-imports"; do
+    for f in tests/*.py; do
+        python3 -c 'import bombast; bombast.main()' $options --seed 5 --record-tape "$out/tape" "$f" "$out/recorded.py"
+        python3 -c 'import bombast; bombast.main()' $options --replay-tape "$out/tape" "$f" "$out/replayed.py"
+        cmp "$out/recorded.py" "$out/replayed.py"
+    done
 done
+rm -r "$out"
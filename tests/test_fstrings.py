@@ -0,0 +1,15 @@
+"""f-strings in a program that binds the names of their converters."""
+
+
+def save(path, format="png"):
+    return f"{path}.{format}"
+
+
+def describe(value, str=None):
+    return f"{value!r:>8} {value!s} {value!a} {str}"
+
+
+repr = ascii
+print(save("image"), save("image", format="jpg"))
+print(describe("café"), describe(3, str="three"))
+print(f"{repr('x')}")
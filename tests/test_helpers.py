@@ -0,0 +1,29 @@
+"""Constants shared with the helpers that bombast adds to a module."""
+import sys
+
+
+def lookup(module, name="implementation"):
+    return getattr(__import__(module), name)
+
+
+def describe(*names, sep=", "):
+    return sep.join(str(name) + "sys" for name in names)
+
+
+def get(mapping, key):
+    return mapping[key] if key in mapping else None
+
+
+def decode(data, encoding="utf-8"):
+    return str(data, encoding)
+
+
+def from_bytes(data):
+    return sum(byte << 8 * i for i, byte in enumerate(data))
+
+
+print(get({"sys": 1}, "sys"), get({}, "zlib"))
+print(decode(b"sys"), from_bytes(b"\x01\x02"), "unicode \u00e9")
+print(lookup("sys").cache_tag, lookup("base64", "b85decode").__name__)
+print(describe("marshal", "zlib", "base64", "index", 0, round(1.5, 3), b"data"))
+print(lookup("zlib", "decompress").__name__, sys.implementation.cache_tag)
@@ -0,0 +1,15 @@
+"""Names shared with the lazy import helper."""
+import json
+import os
+
+
+def items(mapping):
+    return sorted(mapping)
+
+
+def split(path):
+    return os.path.basename(path), os.path.dirname(path)
+
+
+print(items({"b": 1, "a": 2}), split("/tmp/file.txt"))
+print(json.dumps(items({"y": 0, "x": 1})))